@@ -12,12 +12,74 @@ Output:
 """
 
 import json
-import pandas as pd
-import statsmodels.api as sm
+import sys
+import numpy as np
+import pyarrow.parquet as pq
+from scipy.stats import norm
 from pathlib import Path
 from src.core.config import PROJECT_ROOT
+from src.core.parquet_io import read_parquet
 
-def estimate_capm():
+def ols_hc3(x, y):
+    """
+    OLS bivariado y = alpha + beta*x com erros-padrão HC3, em forma fechada.
+
+    Para X = [1, x] a alavancagem é h_i = 1/n + (x_i - x̄)²/Sxx, então o
+    sanduíche (X'X)^-1 X' diag(e_i²/(1-h_i)²) X (X'X)^-1 sai de somas
+    ponderadas, sem montar a matriz chapéu. Mesmo resultado de
+    sm.OLS(...).fit(cov_type='HC3'), inclusive p-valores pela normal.
+
+    Returns:
+        Dict com params, bse, tvalues, pvalues (arrays [alpha, beta]),
+        resid, rsquared, rsquared_adj e nobs.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = x.size
+    
+    dx = x - x.mean()
+    sxx = dx @ dx
+    beta = dx @ (y - y.mean()) / sxx
+    alpha = y.mean() - beta * x.mean()
+    resid = y - alpha - beta * x
+    
+    h = 1.0 / n + dx * dx / sxx
+    w = (resid / (1.0 - h)) ** 2
+    
+    xtx_inv = np.linalg.inv(np.array([[n, x.sum()], [x.sum(), x @ x]]))
+    meat = np.array([[w.sum(), w @ x], [w @ x, w @ (x * x)]])
+    cov = xtx_inv @ meat @ xtx_inv
+    
+    params = np.array([alpha, beta])
+    bse = np.sqrt(np.diag(cov))
+    tvalues = params / bse
+    
+    ssr = resid @ resid
+    sst = (y - y.mean()) @ (y - y.mean())
+    rsquared = 1.0 - ssr / sst
+    
+    return {
+        "params": params,
+        "bse": bse,
+        "tvalues": tvalues,
+        "pvalues": 2 * norm.sf(np.abs(tvalues)),
+        "resid": resid,
+        "rsquared": rsquared,
+        "rsquared_adj": 1.0 - (1.0 - rsquared) * (n - 1) / (n - 2),
+        "nobs": n,
+    }
+
+def _verify_with_statsmodels(y, x, results):
+    """Compara ols_hc3 com statsmodels (OLS + HC3) e avisa divergências."""
+    import statsmodels.api as sm
+    
+    ref = sm.OLS(y, sm.add_constant(x)).fit(cov_type='HC3')
+    for name in ("params", "bse", "pvalues"):
+        if not np.allclose(results[name], np.asarray(getattr(ref, name)), rtol=1e-8, atol=1e-12):
+            print(f"AVISO: {name} diverge do statsmodels: {results[name]} vs {np.asarray(getattr(ref, name))}")
+    print("Verificação com statsmodels concluída.")
+
+def estimate_capm(verify=False):
     # Caminhos
     processed_dir = PROJECT_ROOT / "data" / "processed"
     input_path = processed_dir / "returns" / "returns.parquet"
@@ -30,38 +92,36 @@ def estimate_capm():
         raise FileNotFoundError(f"Arquivo {input_path} não encontrado.")
 
     print("Carregando retornos...")
-    df = pd.read_parquet(input_path)
-    
-    # Garantir que temos as colunas necessárias
+    # Garantir que temos as colunas necessárias (checado no schema, sem ler dados)
     required_cols = ['excess_ret_petr4', 'excess_ret_ibov']
-    if not all(col in df.columns for col in required_cols):
+    available = pq.read_schema(input_path).names
+    if not all(col in available for col in required_cols):
         raise ValueError(f"Colunas necessárias {required_cols} não encontradas.")
+    
+    # Ler apenas as colunas usadas na regressão
+    df = read_parquet(input_path, columns=['date'] + required_cols)
 
     # Remover NaNs
     df_clean = df.dropna(subset=required_cols).copy()
     
-    # Definir variáveis
-    y = df_clean['excess_ret_petr4']
-    X = df_clean['excess_ret_ibov']
-    X = sm.add_constant(X) # Adicionar intercepto (Alpha)
+    # Definir variáveis (intercepto = Alpha)
+    y = df_clean['excess_ret_petr4'].to_numpy()
+    x = df_clean['excess_ret_ibov'].to_numpy()
 
     print("Estimando CAPM (OLS com erros robustos HC3)...")
-    model = sm.OLS(y, X)
-    results = model.fit(cov_type='HC3') # Erros padrão robustos a heterocedasticidade
+    results = ols_hc3(x, y) # Erros padrão robustos a heterocedasticidade
+    if verify:
+        _verify_with_statsmodels(y, x, results)
 
     # Extrair resultados
-    alpha_params = results.params['const']
-    alpha_se = results.bse['const']
-    alpha_t = results.tvalues['const']
-    alpha_p = results.pvalues['const']
-
-    beta_params = results.params['excess_ret_ibov']
-    beta_se = results.bse['excess_ret_ibov']
-    beta_t = results.tvalues['excess_ret_ibov']
-    beta_p = results.pvalues['excess_ret_ibov']
+    alpha_params, beta_params = results["params"]
+    alpha_se, beta_se = results["bse"]
+    alpha_t, beta_t = results["tvalues"]
+    alpha_p, beta_p = results["pvalues"]
     
     # Durbin-Watson
-    dw_stat = sm.stats.stattools.durbin_watson(results.resid)
+    resid = results["resid"]
+    dw_stat = np.sum(np.diff(resid) ** 2) / (resid @ resid)
 
     # Estruturar output
     output_data = {
@@ -77,9 +137,9 @@ def estimate_capm():
             "t_stat": float(beta_t),
             "p_value": float(beta_p)
         },
-        "r_squared": float(results.rsquared),
-        "r_squared_adj": float(results.rsquared_adj),
-        "n_obs": int(results.nobs),
+        "r_squared": float(results["rsquared"]),
+        "r_squared_adj": float(results["rsquared_adj"]),
+        "n_obs": int(results["nobs"]),
         "durbin_watson": float(dw_stat),
         "period": {
             "start": str(df_clean['date'].min().date()),
@@ -95,8 +155,8 @@ def estimate_capm():
     print("-" * 30)
     print(f"Alpha: {alpha_params:.6f} (p={alpha_p:.4f})")
     print(f"Beta:  {beta_params:.6f} (p={beta_p:.4f})")
-    print(f"R2:    {results.rsquared:.4f}")
+    print(f"R2:    {results['rsquared']:.4f}")
     print("-" * 30)
 
 if __name__ == "__main__":
-    estimate_capm()
+    estimate_capm(verify="--verify" in sys.argv[1:])
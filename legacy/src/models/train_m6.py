@@ -20,9 +20,13 @@ import xgboost as xgb
 from sklearn.metrics import accuracy_score, precision_score, recall_score, roc_auc_score, classification_report
 from sklearn.model_selection import TimeSeriesSplit
 import joblib
+import pyarrow.parquet as pq
+from joblib import Parallel, delayed
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
+import hashlib
+import os
 import sys
 
 # Adicionar raiz do projeto ao path
@@ -31,6 +35,7 @@ project_root = current_dir.parent.parent
 sys.path.append(str(project_root))
 
 from src.core.config import PROJECT_ROOT
+from src.core.parquet_io import read_parquet
 from src.core.style import set_style
 
 def load_and_merge_data():
@@ -40,32 +45,71 @@ def load_and_merge_data():
     processed_dir = PROJECT_ROOT / "data" / "processed"
     
     # 1. Carregar Dataset Base (M5 - Fundamentos + Retornos)
-    df_m5 = pd.read_parquet(processed_dir / "ml_dataset.parquet")
+    df_m5 = read_parquet(processed_dir / "ml_dataset.parquet")
     if 'date' in df_m5.columns:
         df_m5 = df_m5.set_index('date')
         
     # 2. Carregar Macro Forecasts (M6 Fase 1)
-    df_macro = pd.read_parquet(processed_dir / "macro_forecasts.parquet")
+    df_macro = read_parquet(processed_dir / "macro_forecasts.parquet")
     # df_macro já tem index datetime
     
     # 3. Carregar Regimes (M6 Fase 2)
-    df_regime = pd.read_parquet(processed_dir / "ibovespa_regimes.parquet")
+    # Ler apenas as colunas relevantes de regime (+ date), filtradas pelo schema
+    regime_path = processed_dir / "ibovespa_regimes.parquet"
+    regime_cols = [
+        c for c in pq.read_schema(regime_path).names
+        if 'prob_regime' in c or 'regime' in c or c == 'date'
+    ]
+    df_regime = read_parquet(regime_path, columns=regime_cols)
     if 'date' in df_regime.columns:
         df_regime = df_regime.set_index('date')
-        
-    # Selecionar colunas relevantes de regime
-    regime_cols = [c for c in df_regime.columns if 'prob_regime' in c or 'regime' in c]
-    df_regime = df_regime[regime_cols]
     
     # Merge (Left Join no M5 para manter a base de trading)
-    df = df_m5.join(df_macro, how='left')
-    df = df.join(df_regime, how='left')
+    # merge_ordered: uma passagem ordenada por data, sem re-hash do índice
+    df = pd.merge_ordered(
+        df_m5.rename_axis('date').reset_index(),
+        df_macro.rename_axis('date').reset_index(),
+        on='date', how='left'
+    )
+    df = pd.merge_ordered(df, df_regime.rename_axis('date').reset_index(), on='date', how='left')
+    df = df.set_index('date')
     
     # Remover linhas sem dados (devido a lags ou janelas de forecast)
     df = df.dropna()
     
     return df
 
+# Datasets unificados por load_and_merge_data
+M6_INPUTS = ("ml_dataset.parquet", "macro_forecasts.parquet", "ibovespa_regimes.parquet")
+
+def load_merged_cached():
+    """
+    Versão com cache de load_and_merge_data.
+
+    A chave é (caminho, mtime, tamanho) dos três parquets de entrada:
+    enquanto nenhum mudar, o resultado unificado é lido de
+    data/cache/m6_merged_{hash}.parquet sem refazer merge + dropna.
+    """
+    processed_dir = PROJECT_ROOT / "data" / "processed"
+    cache_dir = PROJECT_ROOT / "data" / "cache"
+    
+    stats = [(str(p), p.stat().st_mtime_ns, p.stat().st_size)
+             for p in (processed_dir / name for name in M6_INPUTS)]
+    key = hashlib.sha1(str(stats).encode()).hexdigest()[:16]
+    cache_path = cache_dir / f"m6_merged_{key}.parquet"
+    
+    if cache_path.exists():
+        print(f"Dataset unificado lido do cache ({cache_path.name})")
+        return read_parquet(cache_path)
+    
+    df = load_and_merge_data()
+    
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for stale in cache_dir.glob("m6_merged_*.parquet"):
+        stale.unlink()
+    df.to_parquet(cache_path, engine='pyarrow', compression='zstd')
+    return df
+
 def prepare_features_targets(df):
     """
     Prepara features (X) e target (y).
@@ -75,7 +119,8 @@ def prepare_features_targets(df):
     # Assumindo que target_return_1d é R_{t+1}
     
     # Criar Target Binário
-    df['target_bin'] = (df['target_return_1d'] > 0).astype(int)
+    # int8 direto da máscara booleana (mesmo buffer, sem cópia para int64)
+    df['target_bin'] = (df['target_return_1d'].to_numpy() > 0).view(np.int8)
     
     # Definir Features
     
@@ -99,11 +144,68 @@ def prepare_features_targets(df):
         print(f"AVISO: Features faltando: {missing}")
         features = [f for f in features if f in df.columns]
         
+    # float32: precisão usada pelo 'hist' do XGBoost (retornos, z-scores e
+    # probabilidades cabem com folga); metade da memória por feature
     X = df[features]
+    X = X.astype({c: np.float32 for c in X.select_dtypes('float64').columns})
     y = df['target_bin']
     
     return X, y, features
 
+# Folds do TimeSeriesSplit treinados em paralelo (um processo por fold)
+N_SPLITS = 5
+
+# Early stopping: rodadas sem melhora na AUC e fração final do treino de
+# cada fold usada como validação (o fold de teste não participa)
+EARLY_STOPPING_ROUNDS = 30
+VALID_FRACTION = 0.2
+
+def _booster_params(params):
+    """Parâmetros do XGBClassifier no formato da API nativa (xgb.train)."""
+    native = {k: v for k, v in params.items() if k not in ('n_estimators', 'n_jobs', 'random_state')}
+    native.update(nthread=params['n_jobs'], seed=params['random_state'])
+    return native
+
+def _fit_fold(fold, train_idx, test_idx, X, y, params, feature_names):
+    """
+    Treina um fold via xgb.train e retorna suas métricas.
+
+    X (float32) e y são arrays NumPy; o treino usa QuantileDMatrix, já
+    quantizada nos bins do 'hist', e a validação reaproveita os mesmos
+    cortes (ref=dfit) em vez de recalculá-los.
+    """
+    # Validação temporal = trecho final do treino
+    n_fit = int(len(train_idx) * (1 - VALID_FRACTION))
+    fit_idx, valid_idx = train_idx[:n_fit], train_idx[n_fit:]
+    
+    dfit = xgb.QuantileDMatrix(
+        X[fit_idx], y[fit_idx], feature_names=feature_names, max_bin=params['max_bin']
+    )
+    dvalid = xgb.QuantileDMatrix(X[valid_idx], y[valid_idx], ref=dfit, feature_names=feature_names)
+    
+    booster = xgb.train(
+        _booster_params(params), dfit,
+        num_boost_round=params['n_estimators'],
+        evals=[(dvalid, 'valid')],
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        verbose_eval=False
+    )
+    
+    # Predições (probabilidades direto do booster, sem DMatrix de teste)
+    y_test = y[test_idx]
+    y_prob = booster.inplace_predict(X[test_idx], iteration_range=(0, booster.best_iteration + 1))
+    y_pred = (y_prob > 0.5).astype(np.int8)
+    
+    # Métricas
+    return {
+        'fold': fold,
+        'accuracy': accuracy_score(y_test, y_pred),
+        'precision': precision_score(y_test, y_pred),
+        'recall': recall_score(y_test, y_pred),
+        'auc': roc_auc_score(y_test, y_prob),
+        'best_iteration': booster.best_iteration
+    }
+
 def train_model(X, y):
     """
     Treina o modelo XGBoost com validação TimeSeriesSplit.
@@ -114,55 +216,45 @@ def train_model(X, y):
     # Scale pos weight para balancear classes se necessário (geralmente mercado é 50/50, mas bom verificar)
     ratio = float(np.sum(y == 0)) / np.sum(y == 1)
     
-    model = xgb.XGBClassifier(
+    params = dict(
         n_estimators=500,
         learning_rate=0.05,
         max_depth=4,
         subsample=0.8,
         colsample_bytree=0.8,
         objective='binary:logistic',
+        eval_metric='auc',
+        # Histograma (256 bins) em vez do método exato
+        tree_method='hist',
+        max_bin=256,
         scale_pos_weight=ratio,
         random_state=42,
         n_jobs=-1
     )
     
     # Time Series Split para avaliação robusta
-    tscv = TimeSeriesSplit(n_splits=5)
-    
-    metrics = []
+    tscv = TimeSeriesSplit(n_splits=N_SPLITS)
+    
+    # Folds independentes em paralelo; threads do XGBoost divididas entre
+    # os workers para não sobrecarregar a CPU
+    fold_params = {**params, 'n_jobs': max(1, (os.cpu_count() or 1) // N_SPLITS)}
+    # X já vem em float32 de prepare_features_targets: sem cópia aqui
+    X32 = X.to_numpy(dtype=np.float32)
+    y_arr = y.to_numpy()
+    feature_names = list(X.columns)
+    metrics = Parallel(n_jobs=N_SPLITS, backend='loky')(
+        delayed(_fit_fold)(fold, train_idx, test_idx, X32, y_arr, fold_params, feature_names)
+        for fold, (train_idx, test_idx) in enumerate(tscv.split(X32))
+    )
     
-    for fold, (train_idx, test_idx) in enumerate(tscv.split(X)):
-        X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
-        y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
+    for m in metrics:
+        print(f"Fold {m['fold']}: Acc={m['accuracy']:.2%}, AUC={m['auc']:.4f}")
         
-        model.fit(
-            X_train, y_train,
-            eval_set=[(X_train, y_train), (X_test, y_test)],
-            verbose=False
-        )
-        
-        # Predições
-        y_pred = model.predict(X_test)
-        y_prob = model.predict_proba(X_test)[:, 1]
-        
-        # Métricas
-        acc = accuracy_score(y_test, y_pred)
-        prec = precision_score(y_test, y_pred)
-        rec = recall_score(y_test, y_pred)
-        auc = roc_auc_score(y_test, y_prob)
-        
-        metrics.append({
-            'fold': fold,
-            'accuracy': acc,
-            'precision': prec,
-            'recall': rec,
-            'auc': auc
-        })
-        
-        print(f"Fold {fold}: Acc={acc:.2%}, AUC={auc:.4f}")
-        
-    # Treinar no dataset completo para deploy/backtest final
-    print("\nTreinando modelo final no dataset completo...")
+    # Treinar no dataset completo para deploy/backtest final, sem early
+    # stopping: nº de árvores = mediana das melhores iterações dos folds
+    n_trees = int(np.median([m['best_iteration'] for m in metrics])) + 1
+    print(f"\nTreinando modelo final no dataset completo ({n_trees} árvores)...")
+    model = xgb.XGBClassifier(**{**params, 'n_estimators': n_trees})
     model.fit(X, y, verbose=False)
     
     return model, pd.DataFrame(metrics)
@@ -181,15 +273,23 @@ def save_results(model, X, y, metrics_df):
     # Gerar Predições Finais (In-Sample + Out-of-Sample logic would be better, but for now full history)
     # Idealmente, para backtest, usaríamos cross_val_predict, mas em TimeSeries é tricky.
     # Vamos gerar as probabilidades do modelo final para análise.
+    # Uma única passada de inferência; classe pelo mesmo limiar de predict()
     y_prob = model.predict_proba(X)[:, 1]
-    y_pred = model.predict(X)
+    y_pred = (y_prob > 0.5).astype(np.int8)
     
     df_res = X.copy()
     df_res['target_real'] = y
     df_res['pred_prob'] = y_prob
     df_res['pred_class'] = y_pred
     
-    df_res.to_parquet(PROJECT_ROOT / "data" / "processed" / "m6_predictions.parquet")
+    # Rótulos textuais (ex: regime) gravados como dicionário no parquet
+    for c in df_res.select_dtypes('object').columns:
+        df_res[c] = df_res[c].astype('category')
+    
+    df_res.to_parquet(
+        PROJECT_ROOT / "data" / "processed" / "m6_predictions.parquet",
+        engine='pyarrow', compression='zstd', compression_level=3, row_group_size=50_000
+    )
     
     print(f"\nResultados salvos em {output_dir}")
     print(f"Predições salvas em data/processed/m6_predictions.parquet")
@@ -202,13 +302,14 @@ def plot_feature_importance(model, feature_names):
     plt.figure(figsize=(10, 8))
     
     importances = model.feature_importances_
-    indices = np.argsort(importances)[::-1]
     
-    # Top 20 features
+    # Top 20 features: argpartition (linear) e ordenação só dos selecionados
     top_n = min(20, len(feature_names))
+    top_idx = np.argpartition(-importances, top_n - 1)[:top_n]
+    top_idx = top_idx[np.argsort(-importances[top_idx])]
     plt.title(f"Top {top_n} Feature Importances (M6 Classifier)")
-    plt.barh(range(top_n), importances[indices][:top_n], align="center")
-    plt.yticks(range(top_n), [feature_names[i] for i in indices][:top_n])
+    plt.barh(range(top_n), importances[top_idx], align="center")
+    plt.yticks(range(top_n), [feature_names[i] for i in top_idx])
     plt.gca().invert_yaxis()
     plt.tight_layout()
     
@@ -219,7 +320,7 @@ def run_training():
     print("--- M6 Phase 3: Model Training (XGBoost Classifier) ---")
     
     # 1. Load
-    df = load_and_merge_data()
+    df = load_merged_cached()
     print(f"Dataset unificado: {df.shape}")
     
     # 2. Prepare
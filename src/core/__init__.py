@@ -28,39 +28,49 @@ from src.core.config import (
     get_analysis,
 )
 
-from src.core.brapi_loader import (
-    BrapiLoader,
-    BrapiQuoteResult,
-    get_brapi_loader,
-    fetch_quote,
-    fetch_historical,
-    fetch_fundamentals,
-    is_test_ticker,
-    TEST_TICKERS,
-    AVAILABLE_MODULES,
-)
+# Os loaders dependem de pandas/requests e são importados sob demanda
+# (PEP 562): `import src.core` ou `from src.core.cvm_loader import CVM_CODES`
+# não carregam essas bibliotecas até que um loader seja de fato usado.
+_LAZY_EXPORTS = {
+    # Brapi Loader
+    "BrapiLoader": "src.core.brapi_loader",
+    "BrapiQuoteResult": "src.core.brapi_loader",
+    "get_brapi_loader": "src.core.brapi_loader",
+    "fetch_quote": "src.core.brapi_loader",
+    "fetch_historical": "src.core.brapi_loader",
+    "fetch_fundamentals": "src.core.brapi_loader",
+    "is_test_ticker": "src.core.brapi_loader",
+    "TEST_TICKERS": "src.core.brapi_loader",
+    "AVAILABLE_MODULES": "src.core.brapi_loader",
+    # Data Loader
+    "YahooFinanceLoader": "src.core.data_loader",
+    "BCBLoader": "src.core.data_loader",
+    "load_yahoo_data": "src.core.data_loader",
+    "load_stock_prices": "src.core.data_loader",
+    "load_returns": "src.core.data_loader",
+    "load_selic": "src.core.data_loader",
+    # Fundamentals Loader
+    "FundamentalsLoader": "src.core.fundamentals_loader",
+    "FundamentalsData": "src.core.fundamentals_loader",
+    "get_fundamentals_loader": "src.core.fundamentals_loader",
+    # CVM Loader
+    "CVMLoader": "src.core.cvm_loader",
+    "download_all_dfps": "src.core.cvm_loader",
+    "get_company_cvm_code": "src.core.cvm_loader",
+    "CVM_CODES": "src.core.cvm_loader",
+}
 
-from src.core.data_loader import (
-    YahooFinanceLoader,
-    BCBLoader,
-    load_yahoo_data,
-    load_stock_prices,
-    load_returns,
-    load_selic,
-)
 
-from src.core.fundamentals_loader import (
-    FundamentalsLoader,
-    FundamentalsData,
-    get_fundamentals_loader,
-)
-
-from src.core.cvm_loader import (
-    CVMLoader,
-    download_all_dfps,
-    get_company_cvm_code,
-    CVM_CODES,
-)
+def __getattr__(name: str):
+    """Importa sob demanda os símbolos dos loaders."""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    import importlib
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
 
 __all__ = [
     # Config
@@ -29,6 +29,7 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 from src.core.config import Config, get_config
+from src.core.jsonio import json_loads
 
 
 # =============================================================================
@@ -70,6 +71,48 @@ VALID_RANGES = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd",
 # Intervals válidos
 VALID_INTERVALS = ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo", "3mo"]
 
+# Codificações aceitas na resposta (requests/urllib3 descomprimem gzip e deflate;
+# "br" só é seguro quando o pacote brotli está instalado, por isso fica de fora)
+ACCEPT_ENCODING = "gzip, deflate"
+
+
+# =============================================================================
+# SESSÃO HTTP COMPARTILHADA
+# =============================================================================
+
+_SESSION: Optional[requests.Session] = None
+
+
+def _create_session() -> requests.Session:
+    """Cria sessão HTTP keep-alive com retry automático e resposta comprimida."""
+    session = requests.Session()
+    
+    retry_strategy = Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+    
+    adapter = HTTPAdapter(max_retries=retry_strategy)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    
+    return session
+
+
+def _get_session() -> requests.Session:
+    """
+    Retorna a sessão HTTP do módulo.
+
+    Todas as instâncias de BrapiLoader (inclusive as criadas pelos
+    wrappers de conveniência) reaproveitam as mesmas conexões TLS.
+    """
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = _create_session()
+    return _SESSION
+
 
 # =============================================================================
 # DATA CLASSES
@@ -227,23 +270,7 @@ class BrapiLoader:
         self.config = config or get_config()
         self.base_url = self.config.env.brapi_base_url
         self.token = self.config.env.brapi_token
-        self.session = self._create_session()
-    
-    def _create_session(self) -> requests.Session:
-        """Cria sessão HTTP com retry automático."""
-        session = requests.Session()
-        
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
-        
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        
-        return session
+        self.session = _get_session()
     
     def _requires_auth(self, tickers: List[str]) -> bool:
         """
@@ -303,10 +330,14 @@ class BrapiLoader:
         
         logger.debug(f"Requisição: {url}")
         
-        response = self.session.get(url, timeout=30)
-        response.raise_for_status()
-        
-        return response.json()
+        # stream=True evita a cópia intermediária em str: o corpo (já
+        # descomprimido) é lido como bytes e decodificado diretamente
+        response = self.session.get(url, timeout=30, stream=True)
+        try:
+            response.raise_for_status()
+            return json_loads(response.content)
+        finally:
+            response.close()
     
     # -------------------------------------------------------------------------
     # COTAÇÕES
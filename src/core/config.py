@@ -11,13 +11,15 @@ Os módulos em src/ devem APENAS consumir configurações deste módulo.
 """
 
 import os
+import copy
 import json
-import yaml
 from pathlib import Path
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import Optional, List, Dict, Any
 from dotenv import load_dotenv
 
+from src.core.jsonio import json_loads
+
 
 # =============================================================================
 # DETECÇÃO DE RAIZ E CARREGAMENTO DO .ENV
@@ -32,6 +34,17 @@ if not env_path.exists():
 load_dotenv(env_path)
 ANALYSIS_OVERRIDE_PATH = PROJECT_ROOT / "configs" / "analysis_overrides.json"
 
+# Caches de arquivos de configuração, indexados por (caminho, mtime_ns, tamanho):
+# qualquer alteração no arquivo invalida a entrada automaticamente.
+_PARAMS_CACHE: Dict[tuple, Dict[str, Any]] = {}
+_OVERRIDES_CACHE: Dict[tuple, Dict[str, Any]] = {}
+
+
+def _file_key(path: Path) -> tuple:
+    """Chave de cache baseada nos metadados do arquivo."""
+    st = path.stat()
+    return (str(path), st.st_mtime_ns, st.st_size)
+
 
 # =============================================================================
 # CONFIGURAÇÕES DE AMBIENTE (LIDAS DO .ENV)
@@ -135,6 +148,13 @@ class ProjectPaths:
         """Dados brutos do BACEN IF.data (instituições financeiras)."""
         return self.data_external / "bacen"
     
+    # -------------------------------------------------------------------------
+    # CACHE (respostas HTTP reaproveitadas entre execuções)
+    # -------------------------------------------------------------------------
+    @property
+    def data_cache(self) -> Path:
+        return self.root / "data" / "cache"
+    
     # -------------------------------------------------------------------------
     # OUTPUTS
     # -------------------------------------------------------------------------
@@ -244,6 +264,11 @@ class AnalysisConfig:
     formatos_figura: List[str] = field(default_factory=lambda: ["pdf", "png"])
     dpi: int = 300
     
+    # -------------------------------------------------------------------------
+    # COLETA
+    # -------------------------------------------------------------------------
+    parallel_fetch: bool = True                   # Downloads simultâneos no yfinance
+    
     def to_dict(self) -> Dict[str, Any]:
         """Converte para dicionário."""
         return {
@@ -268,32 +293,31 @@ class AnalysisConfig:
         }
 
 
+# Campos válidos de AnalysisConfig (resolvidos uma única vez)
+_ANALYSIS_FIELDS = frozenset(f.name for f in fields(AnalysisConfig))
+
+
 # =============================================================================
 # SINGLETON DE CONFIGURAÇÃO GLOBAL
 # =============================================================================
 
 class Config:
     """
-    Configuração global do projeto (Singleton).
+    Configuração global do projeto.
+    
+    A instância compartilhada é criada sob demanda por get_config();
+    instanciar Config() diretamente produz uma configuração independente.
     
     Uso:
-        from src.core.config import Config
+        from src.core.config import get_config
         
-        cfg = Config()
+        cfg = get_config()
         cfg.analysis.ticker_principal  # Acessa ticker configurado
         cfg.paths.data_processed       # Acessa caminho de dados
         cfg.env.bcb_sgs_base_url       # Acessa URL da API
     """
     
-    _instance: Optional["Config"] = None
-    
-    def __new__(cls) -> "Config":
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialize()
-        return cls._instance
-    
-    def _initialize(self) -> None:
+    def __init__(self) -> None:
         """Inicializa configurações."""
         self._env = EnvConfig.from_env().validate()
         self._paths = ProjectPaths()
@@ -332,27 +356,34 @@ class Config:
         Exemplo:
             cfg.update_analysis(ticker_principal="PETR4.SA", data_inicio="2019-01-01")
         """
-        for key, value in kwargs.items():
-            if hasattr(self._analysis, key):
-                setattr(self._analysis, key, value)
-            else:
-                raise ValueError(f"Configuração desconhecida: {key}")
+        unknown = kwargs.keys() - _ANALYSIS_FIELDS
+        if unknown:
+            raise ValueError(f"Configuração desconhecida: {', '.join(sorted(unknown))}")
+        self._analysis.__dict__.update(kwargs)
     
     def reset(self) -> None:
         """Reseta para configurações default."""
-        self._initialize()
+        self.__init__()
 
     def _load_analysis_overrides(self) -> None:
         """Carrega overrides de análise a partir de arquivo JSON, se existir."""
-        if not ANALYSIS_OVERRIDE_PATH.exists():
-            return
         try:
-            data = json.loads(ANALYSIS_OVERRIDE_PATH.read_text())
-            for key, value in data.items():
-                if hasattr(self._analysis, key):
-                    setattr(self._analysis, key, value)
-        except Exception:
-            pass
+            cache_key = _file_key(ANALYSIS_OVERRIDE_PATH)
+            if cache_key not in _OVERRIDES_CACHE:
+                _OVERRIDES_CACHE[cache_key] = json_loads(ANALYSIS_OVERRIDE_PATH.read_bytes())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            import warnings
+            warnings.warn(f"Overrides de análise ignorados ({ANALYSIS_OVERRIDE_PATH}): {e}", UserWarning)
+            return
+        
+        data = _OVERRIDES_CACHE[cache_key]
+        if not isinstance(data, dict):
+            return
+        self._analysis.__dict__.update(
+            {key: copy.deepcopy(value) for key, value in data.items() if key in _ANALYSIS_FIELDS}
+        )
 
     def save_analysis_overrides(self, data: Dict[str, Any]) -> None:
         """Persiste overrides de análise para uso posterior."""
@@ -364,24 +395,51 @@ class Config:
 # FUNÇÕES DE CONVENIÊNCIA
 # =============================================================================
 
+_CONFIG: Optional[Config] = None
+
+
 def get_config() -> Config:
-    """Retorna instância singleton da configuração."""
-    return Config()
+    """Retorna instância singleton da configuração (criada no primeiro uso)."""
+    global _CONFIG
+    if _CONFIG is None:
+        _CONFIG = Config()
+    return _CONFIG
 
 
 def get_paths() -> ProjectPaths:
     """Atalho para obter caminhos."""
-    return Config().paths
+    return get_config().paths
 
 
 def get_analysis() -> AnalysisConfig:
     """Atalho para obter configurações de análise."""
-    return Config().analysis
+    return get_config().analysis
 
 def load_params() -> Dict[str, Any]:
-    """Carrega parâmetros do arquivo params.yaml."""
+    """
+    Carrega parâmetros do arquivo params.yaml.
+    
+    O resultado é memoizado por (caminho, mtime, tamanho); chamadas repetidas
+    só re-leem o arquivo se ele for alterado. Cada chamada recebe uma cópia
+    independente do dicionário.
+    """
     path = PROJECT_ROOT / "configs" / "params.yaml"
-    if path.exists():
-        with open(path, 'r') as f:
-            return yaml.safe_load(f)
-    return {}
+    if not path.exists():
+        return {}
+    key = _file_key(path)
+    if key not in _PARAMS_CACHE:
+        import yaml
+        try:
+            from yaml import CSafeLoader as _YamlLoader
+        except ImportError:  # PyYAML compilado sem LibYAML
+            from yaml import SafeLoader as _YamlLoader
+        
+        with open(path, 'rb') as f:
+            _PARAMS_CACHE[key] = yaml.load(f, Loader=_YamlLoader) or {}
+    return copy.deepcopy(_PARAMS_CACHE[key])
+
+
+def clear_params_cache() -> None:
+    """Limpa os caches de params.yaml e dos overrides de análise."""
+    _PARAMS_CACHE.clear()
+    _OVERRIDES_CACHE.clear()
@@ -12,20 +12,29 @@ IMPORTANTE: Este módulo é um PIPELINE - não deve conter configurações hardc
 Todas as variáveis devem vir do módulo config.py que é configurado via notebook.
 """
 
+from __future__ import annotations
+
+import functools
+import hashlib
 import io
+import json
 import logging
+import os
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Tuple, Union
 from urllib.parse import urljoin
 
-import pandas as pd
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
 from src.core.config import Config, get_config
+from src.core.parquet_io import write_frame
+
+# pandas e requests são importados sob demanda: consultar CVM_CODES ou
+# get_company_cvm_code não deve pagar o custo de importação dessas bibliotecas
+if TYPE_CHECKING:
+    import pandas as pd
+    import requests
 
 
 # =============================================================================
@@ -49,6 +58,28 @@ CVM_CODES = {
     "VALE3": 4170,    # Vale (alternativa)
 }
 
+# Índice normalizado (maiúsculas) usado nas consultas
+_CVM_CODES_UPPER = {ticker.upper(): code for ticker, code in CVM_CODES.items()}
+
+# Downloads simultâneos de ZIPs (I/O-bound) e tamanho do pool de conexões HTTP
+MAX_DOWNLOAD_WORKERS = 8
+HTTP_POOL_SIZE = 16
+
+# Tamanho dos blocos gravados em disco durante o download (1 MiB)
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Colunas lidas dos CSVs da CVM (comuns a BPA, BPP, DRE, DFC e DVA);
+# as demais (CNPJ, denominação, versão etc.) não são usadas pelo pipeline
+CVM_COLUMNS = [
+    "CD_CVM",
+    "DT_REFER",
+    "DT_FIM_EXERC",
+    "ORDEM_EXERC",
+    "CD_CONTA",
+    "DS_CONTA",
+    "VL_CONTA",
+]
+
 # Tipos de documentos disponíveis
 DOC_TYPES = {
     "BPA": "Balanço Patrimonial Ativo",
@@ -85,6 +116,46 @@ CONTAS_RELEVANTES = {
 }
 
 
+# =============================================================================
+# SESSÃO HTTP COMPARTILHADA
+# =============================================================================
+
+_SESSION: Optional[requests.Session] = None
+
+
+def _create_session() -> requests.Session:
+    """Cria sessão HTTP com retry automático."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    session = requests.Session()
+    
+    retry_strategy = Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+    
+    adapter = HTTPAdapter(
+        max_retries=retry_strategy,
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    
+    return session
+
+
+def _get_session() -> requests.Session:
+    """Retorna a sessão HTTP do módulo, reaproveitando conexões entre loaders."""
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = _create_session()
+    return _SESSION
+
+
 # =============================================================================
 # CVM DATA LOADER
 # =============================================================================
@@ -112,31 +183,123 @@ class CVMLoader:
         """
         self.config = config or get_config()
         self.cache_dir = self.config.paths.external_cvm
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Configurar sessão HTTP com retry
-        self.session = self._create_session()
-    
-    def _create_session(self) -> requests.Session:
-        """Cria sessão HTTP com retry automático."""
-        session = requests.Session()
-        
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
+        self._ensured_dirs: set = set()
+        self._ensure(self.cache_dir)
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
+        # Sessão HTTP com retry, compartilhada entre instâncias
+        self.session = _get_session()
         
-        return session
+        # Índice (nome, nome em minúsculas) dos arquivos de cada ZIP
+        self._zip_index: Dict[Path, List[Tuple[str, str]]] = {}
+    
+    def _ensure(self, path: Path) -> Path:
+        """Cria o diretório apenas na primeira vez em que é usado pelo loader."""
+        if path not in self._ensured_dirs:
+            path.mkdir(parents=True, exist_ok=True)
+            self._ensured_dirs.add(path)
+        return path
     
     # -------------------------------------------------------------------------
     # DOWNLOAD
     # -------------------------------------------------------------------------
     
+    def _stream_to_file(self, url: str, cache_path: Path) -> int:
+        """
+        Baixa URL em blocos diretamente para o disco.
+        
+        O conteúdo é gravado em um arquivo temporário e renomeado ao final,
+        de modo que um download interrompido nunca deixa um ZIP truncado
+        que seria aceito como cache nas próximas execuções.
+        
+        Args:
+            url: URL do arquivo.
+            cache_path: Caminho final do arquivo.
+            
+        Returns:
+            Número de bytes gravados.
+            
+        Raises:
+            requests.HTTPError: Se a requisição falhar.
+        """
+        tmp_path = cache_path.with_suffix(cache_path.suffix + ".tmp")
+        size = 0
+        
+        with self.session.get(url, timeout=60, stream=True) as response:
+            response.raise_for_status()
+            try:
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(tmp_path, cache_path)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+            
+            self._write_cache_meta(cache_path, response.headers)
+        
+        return size
+    
+    @staticmethod
+    def _meta_path(cache_path: Path) -> Path:
+        """Arquivo auxiliar com ETag/Last-Modified de um ZIP em cache."""
+        return cache_path.with_suffix(cache_path.suffix + ".meta.json")
+    
+    def _write_cache_meta(self, cache_path: Path, headers: Dict[str, str]) -> None:
+        """Grava os validadores HTTP da resposta ao lado do arquivo em cache."""
+        meta = {
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+        }
+        self._meta_path(cache_path).write_text(json.dumps(meta))
+    
+    def _is_cache_fresh(self, url: str, cache_path: Path) -> bool:
+        """
+        Verifica se o arquivo em cache ainda corresponde ao remoto.
+        
+        Usa uma requisição HEAD condicional (If-None-Match/If-Modified-Since)
+        com os validadores gravados no download; um 200 também aceita o
+        cache se o ETag ou o Last-Modified devolvidos forem os gravados.
+        Sem validadores gravados, ou sem acesso à rede, o cache local é aceito.
+        """
+        import requests
+        
+        meta_path = self._meta_path(cache_path)
+        if not meta_path.exists():
+            return True
+        
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return True
+        
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        if not headers:
+            return True
+        
+        try:
+            response = self.session.head(url, headers=headers, timeout=30)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Não foi possível validar cache ({e}); usando arquivo local")
+            return True
+        
+        if response.status_code == 304:
+            return True
+        if not response.ok:
+            return True
+        # 200 ao HEAD: servidores que ignoram cabeçalhos condicionais ainda
+        # devolvem os validadores atuais; qualquer um que coincida com o
+        # gravado indica que o arquivo remoto não mudou
+        if meta.get("etag") and response.headers.get("ETag") == meta["etag"]:
+            return True
+        if meta.get("last_modified") and response.headers.get("Last-Modified") == meta["last_modified"]:
+            return True
+        return False
+    
     def download_dfp(self, year: int, force: bool = False) -> Path:
         """
         Baixa arquivo ZIP do DFP de um ano específico.
@@ -148,25 +311,25 @@ class CVMLoader:
         Returns:
             Path do arquivo ZIP baixado.
         """
+        import requests
+        
         filename = f"dfp_cia_aberta_{year}.zip"
         cache_path = self.cache_dir / filename
         
+        # URL do arquivo
+        url = f"{self.BASE_URL}/DFP/DADOS/{filename}"
+        
         # Verificar cache
-        if cache_path.exists() and not force:
+        if cache_path.exists() and not force and self._is_cache_fresh(url, cache_path):
             logger.info(f"Usando cache: {cache_path}")
             return cache_path
         
-        # URL do arquivo
-        url = f"{self.BASE_URL}/DFP/DADOS/{filename}"
         logger.info(f"Baixando DFP {year} de {url}")
         
         try:
-            response = self.session.get(url, timeout=60)
-            response.raise_for_status()
-            
             # Salvar em cache
-            cache_path.write_bytes(response.content)
-            logger.info(f"Salvo em: {cache_path} ({len(response.content) / 1024 / 1024:.1f} MB)")
+            size = self._stream_to_file(url, cache_path)
+            logger.info(f"Salvo em: {cache_path} ({size / 1024 / 1024:.1f} MB)")
             
             return cache_path
             
@@ -187,21 +350,20 @@ class CVMLoader:
         Returns:
             Path do arquivo ZIP.
         """
+        import requests
+        
         filename = f"itr_cia_aberta_{year}.zip"
         cache_path = self.cache_dir / filename
+        url = f"{self.BASE_URL}/ITR/DADOS/{filename}"
         
-        if cache_path.exists() and not force:
+        if cache_path.exists() and not force and self._is_cache_fresh(url, cache_path):
             logger.info(f"Usando cache: {cache_path}")
             return cache_path
         
-        url = f"{self.BASE_URL}/ITR/DADOS/{filename}"
         logger.info(f"Baixando ITR {year} de {url}")
         
         try:
-            response = self.session.get(url, timeout=60)
-            response.raise_for_status()
-            
-            cache_path.write_bytes(response.content)
+            self._stream_to_file(url, cache_path)
             logger.info(f"Salvo em: {cache_path}")
             
             return cache_path
@@ -211,6 +373,48 @@ class CVMLoader:
                 raise FileNotFoundError(f"ITR {year} não disponível")
             raise
     
+    def download_dfps(
+        self,
+        years: List[int],
+        max_workers: int = MAX_DOWNLOAD_WORKERS,
+    ) -> Dict[int, Path]:
+        """
+        Baixa DFPs de vários anos em paralelo.
+        
+        Os downloads são dominados por espera de rede, então são disparados
+        em um pool de threads. Anos indisponíveis na CVM, ou cujo download
+        falhe (erro HTTP, conexão, timeout, disco), são registrados no log e
+        omitidos, sem interromper os demais.
+        
+        Args:
+            years: Anos a baixar.
+            max_workers: Número máximo de downloads simultâneos.
+            
+        Returns:
+            Dicionário {ano: Path} dos ZIPs disponíveis, em ordem de ano.
+        """
+        import requests
+        
+        def _download(year: int) -> Optional[Path]:
+            try:
+                return self.download_dfp(year)
+            except FileNotFoundError:
+                logger.warning(f"DFP {year} não disponível")
+                return None
+            except (requests.exceptions.RequestException, OSError) as e:
+                logger.error(f"Erro ao baixar DFP {year}: {e}")
+                return None
+        
+        years = list(years)
+        if not years:
+            return {}
+        
+        workers = max(1, min(max_workers, len(years)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            paths = list(executor.map(_download, years))
+        
+        return {year: path for year, path in zip(years, paths) if path is not None}
+    
     # -------------------------------------------------------------------------
     # EXTRAÇÃO E PARSING
     # -------------------------------------------------------------------------
@@ -235,22 +439,43 @@ class CVMLoader:
         Returns:
             Dicionário {tipo_doc: DataFrame} com os dados filtrados.
         """
+        import pandas as pd
+        
         doc_types = doc_types or ["BPA", "BPP", "DRE"]
         suffix = "_con_" if consolidated else "_ind_"
         
         results = {}
         
+        # Reaproveitar extrações anteriores gravadas em Parquet
+        cache_paths = {
+            doc_type: self._extract_cache_path(zip_path, cvm_code, doc_type, consolidated)
+            for doc_type in doc_types
+        }
+        pending = []
+        for doc_type in doc_types:
+            if cache_paths[doc_type].exists():
+                df_cached = pd.read_parquet(cache_paths[doc_type])
+                if not df_cached.empty:
+                    results[doc_type] = df_cached
+                logger.debug(f"Cache Parquet: {cache_paths[doc_type]}")
+            else:
+                pending.append(doc_type)
+        
+        if not pending:
+            return results
+        
         with zipfile.ZipFile(zip_path, "r") as zf:
-            for doc_type in doc_types:
+            names = self._zip_names(zip_path, zf)
+            
+            for doc_type in pending:
                 # Encontrar arquivo correspondente
-                pattern = f"dfp_cia_aberta_{doc_type}{suffix}"
-                matching = [f for f in zf.namelist() if pattern.lower() in f.lower()]
+                pattern = f"dfp_cia_aberta_{doc_type}{suffix}".lower()
+                csv_name = next((name for name, lower in names if pattern in lower), None)
                 
-                if not matching:
+                if csv_name is None:
                     logger.warning(f"Documento {doc_type} não encontrado no ZIP")
                     continue
                 
-                csv_name = matching[0]
                 logger.debug(f"Extraindo {csv_name}")
                 
                 # Ler CSV do ZIP
@@ -259,42 +484,78 @@ class CVMLoader:
                         f,
                         sep=";",
                         encoding="latin-1",
-                        dtype={"CD_CVM": str, "CD_CONTA": str},
+                        engine="pyarrow",
+                        usecols=CVM_COLUMNS,
+                        dtype={"CD_CVM": "int32", "CD_CONTA": "category"},
                     )
                 
-                # Filtrar por código CVM
-                df["CD_CVM"] = df["CD_CVM"].astype(str).str.strip()
-                df_company = df[df["CD_CVM"] == str(cvm_code)].copy()
+                # Filtrar por código CVM (comparação inteira, imune a zeros à esquerda)
+                df_company = df[df["CD_CVM"].to_numpy() == int(cvm_code)].copy()
                 
                 if df_company.empty:
+                    # Resultado vazio também é cacheado para não reler o CSV
+                    df_company.to_parquet(cache_paths[doc_type], compression="zstd", index=False)
                     logger.warning(f"Nenhum dado para CD_CVM={cvm_code} em {doc_type}")
                     continue
                 
                 # Limpar e padronizar
                 df_company = self._clean_dataframe(df_company)
+                df_company.to_parquet(cache_paths[doc_type], compression="zstd", index=False)
                 results[doc_type] = df_company
                 
                 logger.info(f"Extraídos {len(df_company)} registros de {doc_type}")
         
-        return results
+        return {doc_type: results[doc_type] for doc_type in doc_types if doc_type in results}
+    
+    def _zip_names(self, zip_path: Path, zf: zipfile.ZipFile) -> List[Tuple[str, str]]:
+        """Lista (nome, nome em minúsculas) dos arquivos do ZIP, memoizada por caminho."""
+        if zip_path not in self._zip_index:
+            self._zip_index[zip_path] = [(name, name.lower()) for name in zf.namelist()]
+        return self._zip_index[zip_path]
+    
+    def _extract_cache_path(
+        self,
+        zip_path: Path,
+        cvm_code: int,
+        doc_type: str,
+        consolidated: bool,
+    ) -> Path:
+        """
+        Caminho do Parquet com a extração de uma empresa/documento.
+        
+        A chave inclui o mtime do ZIP, de modo que um novo download
+        invalida automaticamente as extrações anteriores.
+        """
+        parquet_dir = self._ensure(self.cache_dir / "parquet")
+        
+        raw_key = (
+            f"{zip_path.name}:{zip_path.stat().st_mtime_ns}:{cvm_code}:"
+            f"{doc_type}:{consolidated}"
+        )
+        key = hashlib.sha1(raw_key.encode()).hexdigest()[:16]
+        return parquet_dir / f"{key}_{doc_type}.parquet"
     
     def _clean_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """Limpa e padroniza DataFrame extraído."""
+        import pandas as pd
+        
+        cols = set(df.columns)
+        
         # Converter datas
-        if "DT_REFER" in df.columns:
-            df["DT_REFER"] = pd.to_datetime(df["DT_REFER"], errors="coerce")
-        if "DT_FIM_EXERC" in df.columns:
-            df["DT_FIM_EXERC"] = pd.to_datetime(df["DT_FIM_EXERC"], errors="coerce")
+        for date_col in ("DT_REFER", "DT_FIM_EXERC"):
+            if date_col in cols:
+                df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
         
-        # Converter valores numéricos
-        if "VL_CONTA" in df.columns:
+        # Converter valores numéricos: o parser já entrega float quando o
+        # separador decimal é ".", e só valores com "," passam pela troca
+        if "VL_CONTA" in cols and not pd.api.types.is_numeric_dtype(df["VL_CONTA"]):
             df["VL_CONTA"] = pd.to_numeric(
-                df["VL_CONTA"].astype(str).str.replace(",", "."),
+                df["VL_CONTA"].astype(str).str.replace(",", ".", regex=False),
                 errors="coerce"
             )
         
         # Extrair ano
-        if "DT_REFER" in df.columns:
+        if "DT_REFER" in cols:
             df["ANO"] = df["DT_REFER"].dt.year
         
         return df
@@ -322,23 +583,24 @@ class CVMLoader:
         Returns:
             DataFrame consolidado com histórico financeiro.
         """
+        import pandas as pd
+        
         end_year = end_year or datetime.now().year
         doc_types = doc_types or ["BPA", "BPP", "DRE"]
         
         all_data = {doc: [] for doc in doc_types}
         
-        for year in range(start_year, end_year + 1):
+        # Pré-baixar todos os ZIPs em paralelo; a extração segue sequencial
+        zip_paths = self.download_dfps(list(range(start_year, end_year + 1)))
+        
+        for year, zip_path in zip_paths.items():
             try:
-                zip_path = self.download_dfp(year)
                 year_data = self.extract_company(zip_path, cvm_code, doc_types)
                 
                 for doc_type, df in year_data.items():
                     if not df.empty:
                         all_data[doc_type].append(df)
                         
-            except FileNotFoundError:
-                logger.warning(f"DFP {year} não disponível, pulando...")
-                continue
             except Exception as e:
                 logger.error(f"Erro ao processar DFP {year}: {e}")
                 continue
@@ -365,71 +627,52 @@ class CVMLoader:
         Returns:
             DataFrame com métricas por ano.
         """
+        import pandas as pd
+        
         if not data:
             return pd.DataFrame()
         
-        # Extrair métricas de cada demonstração
-        metrics = []
-        
         # Anos disponíveis
         years = set()
         for df in data.values():
             if "ANO" in df.columns:
-                years.update(df["ANO"].dropna().unique())
+                years.update(int(y) for y in df["ANO"].dropna().unique())
         
-        for year in sorted(years):
-            row = {"ano": int(year)}
-            
-            # BPA - Ativo Total
-            if "BPA" in data:
-                bpa = data["BPA"]
-                bpa_year = bpa[bpa["ANO"] == year]
-                
-                # Ativo Total (código 1)
-                ativo = bpa_year[bpa_year["CD_CONTA"] == "1"]
-                if not ativo.empty:
-                    row["ativo_total"] = ativo["VL_CONTA"].iloc[-1]
-            
-            # BPP - Patrimônio Líquido e Passivo
-            if "BPP" in data:
-                bpp = data["BPP"]
-                bpp_year = bpp[bpp["ANO"] == year]
-                
-                # Patrimônio Líquido (código 2.03)
-                pl = bpp_year[bpp_year["CD_CONTA"].str.startswith("2.03")]
-                if not pl.empty:
-                    row["patrimonio_liquido"] = pl["VL_CONTA"].iloc[-1]
-                
-                # Passivo Total (código 2)
-                passivo = bpp_year[bpp_year["CD_CONTA"] == "2"]
-                if not passivo.empty:
-                    row["passivo_total"] = passivo["VL_CONTA"].iloc[-1]
-            
-            # DRE - Lucro Líquido e Receitas
-            if "DRE" in data:
-                dre = data["DRE"]
-                dre_year = dre[dre["ANO"] == year]
-                
-                # Lucro Líquido (código 3.07 ou 3.11)
-                lucro = dre_year[
-                    dre_year["CD_CONTA"].str.startswith("3.07") |
-                    dre_year["CD_CONTA"].str.startswith("3.11")
-                ]
-                if not lucro.empty:
-                    row["lucro_liquido"] = lucro["VL_CONTA"].iloc[-1]
-                
-                # Receita Total (código 3.01)
-                receita = dre_year[dre_year["CD_CONTA"].str.startswith("3.01")]
-                if not receita.empty:
-                    row["receita_total"] = receita["VL_CONTA"].iloc[-1]
-            
-            metrics.append(row)
+        if not years:
+            return pd.DataFrame()
         
-        # Criar DataFrame
-        df = pd.DataFrame(metrics)
+        # Extrair métricas de cada demonstração (um passo vetorizado por conta)
+        metrics: Dict[str, pd.Series] = {}
+        
+        # BPA - Ativo Total (código 1)
+        if "BPA" in data:
+            bpa = data["BPA"]
+            metrics["ativo_total"] = self._last_by_year(bpa, bpa["CD_CONTA"] == "1")
+        
+        # BPP - Patrimônio Líquido (código 2.03) e Passivo Total (código 2)
+        if "BPP" in data:
+            bpp = data["BPP"]
+            metrics["patrimonio_liquido"] = self._last_by_year(
+                bpp, bpp["CD_CONTA"].str.startswith("2.03", na=False)
+            )
+            metrics["passivo_total"] = self._last_by_year(bpp, bpp["CD_CONTA"] == "2")
+        
+        # DRE - Lucro Líquido (código 3.07 ou 3.11) e Receita Total (código 3.01)
+        if "DRE" in data:
+            dre = data["DRE"]
+            metrics["lucro_liquido"] = self._last_by_year(
+                dre,
+                dre["CD_CONTA"].str.startswith(("3.07", "3.11"), na=False),
+            )
+            metrics["receita_total"] = self._last_by_year(
+                dre, dre["CD_CONTA"].str.startswith("3.01", na=False)
+            )
         
-        if df.empty:
-            return df
+        # Criar DataFrame
+        df = pd.DataFrame({"ano": sorted(years)})
+        for name, values in metrics.items():
+            if not values.empty:
+                df[name] = df["ano"].map(values)
         
         # Calcular métricas derivadas
         if "lucro_liquido" in df.columns and "patrimonio_liquido" in df.columns:
@@ -443,6 +686,27 @@ class CVMLoader:
         
         return df.sort_values("ano").reset_index(drop=True)
     
+    @staticmethod
+    def _last_by_year(df: pd.DataFrame, mask: pd.Series) -> pd.Series:
+        """
+        Último VL_CONTA de cada ano entre as linhas selecionadas.
+        
+        Args:
+            df: Demonstração com colunas ANO e VL_CONTA.
+            mask: Máscara booleana das contas desejadas.
+            
+        Returns:
+            Série indexada pelo ano (int).
+        """
+        import pandas as pd
+        
+        selected = df.loc[mask & df["ANO"].notna(), ["ANO", "VL_CONTA"]]
+        selected = selected.drop_duplicates("ANO", keep="last")
+        return pd.Series(
+            selected["VL_CONTA"].to_numpy(),
+            index=selected["ANO"].astype(int).to_numpy(),
+        )
+    
     # -------------------------------------------------------------------------
     # SALVAMENTO
     # -------------------------------------------------------------------------
@@ -451,6 +715,7 @@ class CVMLoader:
         self,
         data: Dict[str, pd.DataFrame],
         company_ticker: str = "petr4",
+        format: Literal["parquet", "csv"] = "parquet",
     ) -> Dict[str, Path]:
         """
         Salva dados brutos extraídos em external/cvm/.
@@ -458,18 +723,17 @@ class CVMLoader:
         Args:
             data: Dicionário {tipo_doc: DataFrame}.
             company_ticker: Ticker da empresa para nome dos arquivos.
+            format: "parquet" (padrão, zstd) ou "csv" para inspeção manual.
             
         Returns:
             Dicionário {tipo_doc: Path} dos arquivos salvos.
         """
-        output_dir = self.cache_dir / f"dfp_{company_ticker}_raw"
-        output_dir.mkdir(parents=True, exist_ok=True)
+        output_dir = self._ensure(self.cache_dir / f"dfp_{company_ticker}_raw")
         
         paths = {}
         for doc_type, df in data.items():
             if not df.empty:
-                path = output_dir / f"{doc_type.lower()}.csv"
-                df.to_csv(path, index=False)
+                path = write_frame(df, output_dir / doc_type.lower(), format)
                 paths[doc_type] = path
                 logger.info(f"Salvo: {path}")
         
@@ -478,20 +742,22 @@ class CVMLoader:
     def save_processed(
         self,
         df: pd.DataFrame,
-        filename: str = "financials_petr4.csv",
+        filename: str = "financials_petr4",
+        format: Literal["parquet", "csv"] = "parquet",
     ) -> Path:
         """
         Salva dados processados em data/processed/.
         
         Args:
             df: DataFrame consolidado.
-            filename: Nome do arquivo.
+            filename: Nome do arquivo (a extensão é definida por `format`).
+            format: "parquet" (padrão, zstd) ou "csv" para inspeção manual.
             
         Returns:
             Path do arquivo salvo.
         """
-        output_path = self.config.paths.data_processed / filename
-        df.to_csv(output_path, index=False)
+        output_dir = self._ensure(self.config.paths.data_processed)
+        output_path = write_frame(df, output_dir / filename, format)
         logger.info(f"Salvo: {output_path}")
         return output_path
 
@@ -543,25 +809,22 @@ def download_all_dfps(
     end_year = end_year or datetime.now().year
     loader = CVMLoader()
     
-    paths = []
-    for year in range(start_year, end_year + 1):
-        try:
-            path = loader.download_dfp(year)
-            paths.append(path)
-        except FileNotFoundError:
-            logger.warning(f"DFP {year} não disponível")
-    
-    return paths
+    paths = loader.download_dfps(list(range(start_year, end_year + 1)))
+    return list(paths.values())
 
 
+@functools.lru_cache(maxsize=256)
 def get_company_cvm_code(ticker: str) -> Optional[int]:
     """
     Retorna código CVM de um ticker.
     
+    Para colunas inteiras de um DataFrame, prefira a forma vetorizada
+    `df["ticker"].str.upper().map(CVM_CODES)` a chamar esta função por linha.
+    
     Args:
         ticker: Código do ativo (ex: "PETR4").
         
     Returns:
         Código CVM ou None se não encontrado.
     """
-    return CVM_CODES.get(ticker.upper())
+    return _CVM_CODES_UPPER.get(ticker.upper())
@@ -9,14 +9,25 @@ Todas as variáveis devem vir do módulo config.py.
 """
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Literal, Union
 
 import pandas as pd
 import numpy as np
 
 from src.core.config import get_config, Config
+from src.core.parquet_io import write_frame
+from src.core.http_session import (
+    PRICES_CACHE_TTL,
+    clear_session_cache,
+    fetch_sgs_json,
+    get_cached_session,
+    get_sgs_session,
+    get_ticker,
+    yf_session_kwargs,
+)
 
 
 # =============================================================================
@@ -26,6 +37,37 @@ from src.core.config import get_config, Config
 logger = logging.getLogger(__name__)
 
 
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+# Máximo de símbolos por chamada a yf.download
+YF_BATCH_SIZE = 20
+
+# Máximo de séries SGS buscadas simultaneamente
+SGS_MAX_WORKERS = 8
+
+# Colunas de preço reduzidas para float32 após a coleta
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close"]
+
+
+def _downcast(df: pd.DataFrame, interval: str = "1d") -> pd.DataFrame:
+    """
+    Reduz preços para float32 e Volume para o menor inteiro que o comporte.
+    
+    Dados intradiários ("1m", "5m", "1h", ...) são mantidos em float64.
+    """
+    if interval.endswith(("m", "h")) and not interval.endswith("mo"):
+        return df
+    
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(np.float32)
+    if "Volume" in df.columns and pd.api.types.is_integer_dtype(df["Volume"]):
+        df["Volume"] = pd.to_numeric(df["Volume"], downcast="integer")
+    return df
+
+
 # =============================================================================
 # YAHOO FINANCE DATA LOADER
 # =============================================================================
@@ -46,6 +88,7 @@ class YahooFinanceLoader:
         """
         self.config = config or get_config()
         self._yf = None
+        self._session = get_cached_session("yahoo_finance", PRICES_CACHE_TTL)
     
     @property
     def yf(self):
@@ -61,6 +104,11 @@ class YahooFinanceLoader:
                 )
         return self._yf
     
+    def clear_cache(self) -> None:
+        """Descarta as respostas do Yahoo Finance armazenadas em data/cache/."""
+        clear_session_cache(self._session)
+        get_ticker.cache_clear()
+    
     def fetch_prices(
         self,
         ticker: str,
@@ -86,7 +134,7 @@ class YahooFinanceLoader:
         
         logger.info(f"Buscando dados de {ticker} de {start} a {end}")
         
-        stock = self.yf.Ticker(ticker)
+        stock = get_ticker(self.yf, ticker, self._session)
         df = stock.history(start=start, end=end, interval=interval)
         
         if df.empty:
@@ -94,13 +142,88 @@ class YahooFinanceLoader:
             return pd.DataFrame()
         
         # Reset index para ter Date como coluna
-        df = df.reset_index()
+        df = _downcast(df.reset_index(), interval)
         df["Ticker"] = ticker
         
         logger.info(f"Obtidos {len(df)} registros para {ticker}")
         
         return df
     
+    def fetch_prices_batch(
+        self,
+        tickers: List[str],
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        interval: str = "1d",
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Obtém preços de vários ativos em uma única chamada a yf.download.
+        
+        Os tickers são enviados em lotes de até YF_BATCH_SIZE símbolos;
+        cada lote é uma requisição agrupada em vez de uma por ativo, com os
+        símbolos baixados em paralelo se config.analysis.parallel_fetch.
+        
+        Args:
+            tickers: Lista de códigos de ativos.
+            start: Data inicial (YYYY-MM-DD). Default: config.data_inicio.
+            end: Data final (YYYY-MM-DD). Default: config.data_fim.
+            interval: Intervalo dos dados ("1d", "1wk", "1mo").
+            
+        Returns:
+            Dicionário {ticker: DataFrame} no mesmo formato de fetch_prices.
+            Ativos sem dados são omitidos.
+        """
+        analysis = self.config.analysis
+        start = start or analysis.data_inicio
+        end = end or analysis.data_fim
+        
+        tickers = list(dict.fromkeys(tickers))
+        results: Dict[str, pd.DataFrame] = {}
+        
+        # Ticker categórico com as mesmas categorias em todos os frames:
+        # a coluna continua categórica após pd.concat
+        ticker_dtype = pd.CategoricalDtype(tickers)
+        
+        for i in range(0, len(tickers), YF_BATCH_SIZE):
+            batch = tickers[i:i + YF_BATCH_SIZE]
+            logger.info(f"Buscando dados de {batch} de {start} a {end}")
+            
+            raw = self.yf.download(
+                tickers=" ".join(batch),
+                start=start,
+                end=end,
+                interval=interval,
+                group_by="ticker",
+                auto_adjust=True,
+                actions=True,
+                threads=self.config.analysis.parallel_fetch,
+                progress=False,
+                **yf_session_kwargs(self.yf, self._session),
+            )
+            
+            for ticker in batch:
+                if isinstance(raw.columns, pd.MultiIndex):
+                    if ticker not in raw.columns.get_level_values(0):
+                        logger.warning(f"Nenhum dado retornado para {ticker}")
+                        continue
+                    df = raw.xs(ticker, axis=1, level=0)
+                else:
+                    df = raw
+                
+                df = df.dropna(how="all")
+                if df.empty:
+                    logger.warning(f"Nenhum dado retornado para {ticker}")
+                    continue
+                
+                df = _downcast(df.reset_index(), interval)
+                df.columns.name = None
+                df["Ticker"] = pd.Categorical([ticker] * len(df), dtype=ticker_dtype)
+                results[ticker] = df
+                
+                logger.info(f"Obtidos {len(df)} registros para {ticker}")
+        
+        return results
+    
     def fetch_multiple(
         self,
         tickers: List[str],
@@ -118,16 +241,12 @@ class YahooFinanceLoader:
         Returns:
             DataFrame concatenado com coluna 'Ticker' identificando cada ativo.
         """
-        dfs = []
-        for ticker in tickers:
-            df = self.fetch_prices(ticker, start, end)
-            if not df.empty:
-                dfs.append(df)
+        dfs = list(self.fetch_prices_batch(tickers, start, end).values())
         
         if not dfs:
             return pd.DataFrame()
         
-        return pd.concat(dfs, ignore_index=True)
+        return pd.concat(dfs, ignore_index=True, sort=False)
     
     def fetch_returns(
         self,
@@ -149,29 +268,70 @@ class YahooFinanceLoader:
             DataFrame com colunas: Date, Price, Return.
         """
         df = self.fetch_prices(ticker, start, end)
+        return self._compute_returns_from_df(df, ticker, period=period)
+    
+    @staticmethod
+    def _compute_returns_from_df(
+        df: pd.DataFrame,
+        ticker: str,
+        price_col: str = "Close",
+        period: str = "daily",
+    ) -> pd.DataFrame:
+        """
+        Calcula retornos a partir de preços já carregados (sem nova requisição).
         
+        Usar Adj Close para retornos (ajustado por dividendos/splits);
+        yfinance retorna 'Close' já ajustado na versão mais recente.
+        
+        Args:
+            df: Preços no formato de fetch_prices (colunas Date e `price_col`).
+            ticker: Código do ativo, gravado na coluna Ticker.
+            price_col: Coluna de preço usada no cálculo.
+            period: Tipo de retorno ("daily", "monthly").
+            
+        Returns:
+            DataFrame com colunas: Date, Price, Return, LogReturn, Ticker.
+        """
         if df.empty:
             return pd.DataFrame()
         
-        # Usar Adj Close para retornos (ajustado por dividendos/splits)
-        # yfinance retorna 'Close' já ajustado na versão mais recente
-        price_col = "Close"
-        
         if period == "monthly":
-            df["YearMonth"] = df["Date"].dt.to_period("M")
-            df = df.groupby("YearMonth").last().reset_index()
-            df["Date"] = df["YearMonth"].dt.to_timestamp()
-        
-        df["Return"] = df[price_col].pct_change()
-        df["LogReturn"] = np.log(df[price_col] / df[price_col].shift(1))
-        
-        result = df[["Date", price_col, "Return", "LogReturn"]].copy()
-        result.columns = ["Date", "Price", "Return", "LogReturn"]
-        result["Ticker"] = ticker
-        
-        return result.dropna()
+            # Último preço de cada mês, rotulado no primeiro dia do mês
+            df = (
+                df[["Date", price_col]]
+                .resample("MS", on="Date")
+                .last()
+                .dropna(subset=[price_col])
+                .reset_index()
+            )
+        
+        # Razão P_t / P_{t-1} calculada uma única vez sobre o array NumPy;
+        # retorno simples e log-retorno derivam dela. A primeira linha não
+        # tem retorno; linhas com preço ausente, e a seguinte a cada uma,
+        # também ficam sem retorno e saem (como no dropna() anterior).
+        prices = df[price_col].to_numpy(dtype=float)
+        ratio = prices[1:] / prices[:-1]
+        keep = ~np.isnan(ratio)
+        ratio = ratio[keep]
+        
+        result = pd.DataFrame({
+            "Date": df["Date"].to_numpy()[1:][keep],
+            "Price": prices[1:][keep],
+            "Return": ratio - 1,
+            "LogReturn": np.log(ratio),
+            # Coluna constante: categórica ocupa 1 byte por linha
+            "Ticker": pd.Categorical.from_codes(
+                np.zeros(len(ratio), dtype=np.int8), categories=[ticker]
+            ),
+        })
+        
+        return result
     
-    def fetch_analysis_data(self, save_external: bool = True) -> Dict[str, pd.DataFrame]:
+    def fetch_analysis_data(
+        self,
+        save_external: bool = True,
+        format: Literal["parquet", "csv"] = "parquet",
+    ) -> Dict[str, pd.DataFrame]:
         """
         Obtém todos os dados necessários para a análise CAPM.
         
@@ -182,6 +342,7 @@ class YahooFinanceLoader:
           
         Args:
             save_external: Se True, salva dados brutos em data/external/yahoo_finance/
+            format: Formato dos arquivos brutos ("parquet" ou "csv").
           
         Returns:
             Dicionário com DataFrames:
@@ -192,45 +353,56 @@ class YahooFinanceLoader:
         """
         analysis = self.config.analysis
         
-        # Ativo principal
-        logger.info(f"Carregando ativo principal: {analysis.ticker_principal}")
-        principal = self.fetch_prices(analysis.ticker_principal)
+        # Ativo principal, mercado e pares em uma única chamada agrupada
+        # (downloads simultâneos, ver AnalysisConfig.parallel_fetch)
+        logger.info(
+            f"Carregando ativo principal ({analysis.ticker_principal}), "
+            f"benchmark ({analysis.ticker_mercado}) e pares ({analysis.tickers_pares})"
+        )
+        prices = self.fetch_prices_batch(
+            [analysis.ticker_principal, analysis.ticker_mercado] + analysis.tickers_pares
+        )
         
-        # Mercado
-        logger.info(f"Carregando benchmark: {analysis.ticker_mercado}")
-        mercado = self.fetch_prices(analysis.ticker_mercado)
+        principal = prices.get(analysis.ticker_principal, pd.DataFrame())
+        mercado = prices.get(analysis.ticker_mercado, pd.DataFrame())
         
-        # Pares
-        logger.info(f"Carregando pares: {analysis.tickers_pares}")
-        pares = self.fetch_multiple(analysis.tickers_pares)
+        pares_dfs = [prices[t] for t in analysis.tickers_pares if t in prices]
+        pares = pd.concat(pares_dfs, ignore_index=True, sort=False) if pares_dfs else pd.DataFrame()
         
         # Salvar dados brutos em external/yahoo_finance/
         if save_external:
             external_dir = self.config.paths.external_yahoo
             external_dir.mkdir(parents=True, exist_ok=True)
             
-            if not principal.empty:
-                principal.to_csv(external_dir / "prices_principal.csv", index=False)
-            if not mercado.empty:
-                mercado.to_csv(external_dir / "prices_mercado.csv", index=False)
-            if not pares.empty:
-                pares.to_csv(external_dir / "prices_pares.csv", index=False)
+            outputs = [
+                (df, external_dir / f"prices_{name}")
+                for name, df in (("principal", principal), ("mercado", mercado), ("pares", pares))
+                if not df.empty
+            ]
+            if outputs:
+                # Gravações independentes: sobrepõe a escrita/compressão dos arquivos
+                with ThreadPoolExecutor(max_workers=len(outputs)) as executor:
+                    list(executor.map(lambda args: write_frame(*args, format), outputs))
             
             logger.info(f"Dados brutos salvos em {external_dir}")
         
-        # Retornos para CAPM (dado processado/derivado)
-        ret_principal = self.fetch_returns(analysis.ticker_principal)
-        ret_mercado = self.fetch_returns(analysis.ticker_mercado)
+        # Retornos para CAPM (dado processado/derivado), calculados sobre os
+        # preços já baixados acima
+        ret_principal = self._compute_returns_from_df(principal, analysis.ticker_principal)
+        ret_mercado = self._compute_returns_from_df(mercado, analysis.ticker_mercado)
         
-        # Merge de retornos
+        # Merge de retornos: join por DatetimeIndex ordenado (merge-join
+        # linear, sem tabela hash)
         if not ret_principal.empty and not ret_mercado.empty:
-            returns = ret_principal[["Date", "Return"]].copy()
-            returns.columns = ["Date", "Return_Stock"]
+            stock = ret_principal.set_index("Date")["Return"].rename("Return_Stock")
+            market = ret_mercado.set_index("Date")["Return"].rename("Return_Market")
             
-            ret_m = ret_mercado[["Date", "Return"]].copy()
-            ret_m.columns = ["Date", "Return_Market"]
-            
-            returns = returns.merge(ret_m, on="Date", how="inner")
+            returns = (
+                stock.sort_index()
+                .to_frame()
+                .join(market.sort_index(), how="inner")
+                .reset_index()
+            )
         else:
             returns = pd.DataFrame()
         
@@ -245,6 +417,7 @@ class YahooFinanceLoader:
         self,
         data: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
         filename: str,
+        format: Literal["parquet", "csv"] = "parquet",
     ) -> Path:
         """
         Salva dados brutos em data/external/yahoo_finance/.
@@ -252,6 +425,7 @@ class YahooFinanceLoader:
         Args:
             data: DataFrame ou dicionário de DataFrames.
             filename: Nome do arquivo (sem extensão).
+            format: "parquet" (padrão, zstd) ou "csv" para inspeção manual.
             
         Returns:
             Path do arquivo salvo.
@@ -263,14 +437,12 @@ class YahooFinanceLoader:
             paths = []
             for name, df in data.items():
                 if isinstance(df, pd.DataFrame) and not df.empty:
-                    path = output_dir / f"{filename}_{name}.csv"
-                    df.to_csv(path, index=False)
+                    path = write_frame(df, output_dir / f"{filename}_{name}", format)
                     logger.info(f"Salvo (external): {path}")
                     paths.append(path)
             return paths[0] if paths else None
         else:
-            path = output_dir / f"{filename}.csv"
-            data.to_csv(path, index=False)
+            path = write_frame(data, output_dir / filename, format)
             logger.info(f"Salvo (external): {path}")
             return path
     
@@ -278,6 +450,7 @@ class YahooFinanceLoader:
         self,
         data: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
         filename: str,
+        format: Literal["parquet", "csv"] = "parquet",
     ) -> Path:
         """
         Salva dados em data/processed/.
@@ -285,6 +458,7 @@ class YahooFinanceLoader:
         Args:
             data: DataFrame ou dicionário de DataFrames.
             filename: Nome do arquivo (sem extensão).
+            format: "parquet" (padrão, zstd) ou "csv" para inspeção manual.
             
         Returns:
             Path do arquivo salvo.
@@ -296,14 +470,12 @@ class YahooFinanceLoader:
             paths = []
             for name, df in data.items():
                 if isinstance(df, pd.DataFrame) and not df.empty:
-                    path = output_dir / f"{filename}_{name}.csv"
-                    df.to_csv(path, index=False)
+                    path = write_frame(df, output_dir / f"{filename}_{name}", format)
                     logger.info(f"Salvo: {path}")
                     paths.append(path)
             return paths[0] if paths else None
         else:
-            path = output_dir / f"{filename}.csv"
-            data.to_csv(path, index=False)
+            path = write_frame(data, output_dir / filename, format)
             logger.info(f"Salvo: {path}")
             return path
 
@@ -336,21 +508,10 @@ class BCBLoader:
     def __init__(self, config: Optional[Config] = None):
         """Inicializa o loader."""
         self.config = config or get_config()
-        self._bcb = None
     
-    @property
-    def bcb(self):
-        """Importa python-bcb sob demanda."""
-        if self._bcb is None:
-            try:
-                from bcb import sgs
-                self._bcb = sgs
-            except ImportError:
-                raise ImportError(
-                    "python-bcb não está instalado. "
-                    "Execute: pip install python-bcb"
-                )
-        return self._bcb
+    def clear_cache(self) -> None:
+        """Descarta as respostas do SGS armazenadas em data/cache/."""
+        clear_session_cache(get_sgs_session())
     
     def fetch_series(
         self,
@@ -376,16 +537,71 @@ class BCBLoader:
         start = start or analysis.data_inicio
         end = end or analysis.data_fim
         
-        logger.info(f"Buscando série SGS {code} de {start} a {end}")
+        df = self._fetch_sgs(code, start, end)
+        df["SeriesCode"] = code
+        
+        return df
+    
+    def fetch_series_many(
+        self,
+        codes: Dict[str, Union[int, str]],
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Obtém várias séries do SGS de uma vez, em formato largo.
+        
+        As séries são buscadas em paralelo pela mesma sessão HTTP e
+        alinhadas por data.
+        
+        Args:
+            codes: Dicionário {nome_coluna: código ou nome em SERIES_CODES}.
+            start: Data inicial.
+            end: Data final.
+            
+        Returns:
+            DataFrame com coluna Date e uma coluna por série.
+        """
+        if not codes:
+            return pd.DataFrame()
         
-        df = self.bcb.get(code, start=start, end=end)
+        resolved = {
+            name: self.SERIES_CODES.get(code, code) if isinstance(code, str) else code
+            for name, code in codes.items()
+        }
         
-        if isinstance(df, pd.Series):
-            df = df.to_frame(name="Value")
+        analysis = self.config.analysis
+        start = start or analysis.data_inicio
+        end = end or analysis.data_fim
         
-        df = df.reset_index()
-        df.columns = ["Date", "Value"]
-        df["SeriesCode"] = code
+        workers = min(SGS_MAX_WORKERS, len(resolved))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            frames = executor.map(
+                lambda code: self._fetch_sgs(code, start, end), resolved.values()
+            )
+            series = [
+                df.set_index("Date")["Value"].rename(name)
+                for name, df in zip(resolved, frames)
+            ]
+        
+        return pd.concat(series, axis=1).sort_index().rename_axis("Date").reset_index()
+    
+    def _fetch_sgs(self, code: int, start: str, end: str) -> pd.DataFrame:
+        """Busca uma série na API JSON do SGS; retorna colunas Date e Value."""
+        logger.info(f"Buscando série SGS {code} de {start} a {end}")
+        
+        # Requisição direta à API JSON do SGS (sessão e cache compartilhados com fetch_cdi)
+        records = fetch_sgs_json(
+            code, f"{pd.to_datetime(start):%d/%m/%Y}", f"{pd.to_datetime(end):%d/%m/%Y}"
+        )
+        df = pd.DataFrame(records, columns=["data", "valor"])
+        df = pd.DataFrame({
+            "Date": pd.to_datetime(df["data"], format="%d/%m/%Y"),
+            "Value": pd.to_numeric(
+                df["valor"].astype(str).str.replace(",", ".", regex=False),
+                errors="coerce",
+            ),
+        })
         
         return df
     
@@ -14,114 +14,155 @@ Date: 2025
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import cached_property
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
+import numpy as np
 import pandas as pd
 import yfinance as yf
 
 from .config import Config, get_config
+from .http_session import (
+    FUNDAMENTALS_CACHE_TTL,
+    clear_session_cache,
+    get_cached_session,
+    get_ticker,
+)
+from .parquet_io import write_frame
+
+# Máximo de requisições simultâneas ao Yahoo Finance (I/O-bound)
+MAX_FETCH_WORKERS = 16
+
+
+# Campos de FundamentalsData.to_dict: (nome de saída, chave em info, default)
+_FIELD_MAP: tuple[tuple[str, str, Any], ...] = (
+    ('setor', 'sector', 'N/A'),
+    ('industria', 'industry', None),
+    ('market_cap', 'marketCap', 0),
+    ('enterprise_value', 'enterpriseValue', None),
+    ('price', 'currentPrice', 0),
+    ('pl_trailing', 'trailingPE', None),
+    ('pl_forward', 'forwardPE', None),
+    ('pvp', 'priceToBook', None),
+    ('ev_ebitda', 'enterpriseToEbitda', None),
+    ('dividend_yield', 'dividendYield', None),
+    ('dividend_rate', 'dividendRate', None),
+    ('payout_ratio', 'payoutRatio', None),
+    ('roe', 'returnOnEquity', None),
+    ('roa', 'returnOnAssets', None),
+    ('margem_liquida', 'profitMargins', None),
+    ('margem_operacional', 'operatingMargins', None),
+    ('crescimento_lucro_5a', 'earningsQuarterlyGrowth', None),
+    ('crescimento_receita', 'revenueGrowth', None),
+    ('eps_trailing', 'trailingEps', None),
+    ('eps_forward', 'forwardEps', None),
+    ('book_value', 'bookValue', None),
+    ('shares_outstanding', 'sharesOutstanding', None),
+    ('float_shares', 'floatShares', None),
+    ('target_price_mean', 'targetMeanPrice', None),
+    ('target_price_low', 'targetLowPrice', None),
+    ('target_price_high', 'targetHighPrice', None),
+    ('recommendation', 'recommendationKey', 'N/A'),
+)
 
 
 @dataclass
 class FundamentalsData:
-    """Container para dados fundamentais de uma ação."""
+    """
+    Container para dados fundamentais de uma ação.
+    
+    As métricas derivadas de `info` são calculadas uma vez por instância
+    (cached_property). Os demonstrativos trimestrais só são baixados do
+    `yf.Ticker` de origem no primeiro acesso.
+    """
     
     ticker: str
     info: dict[str, Any]
-    balance_sheet: pd.DataFrame
-    income_stmt: pd.DataFrame
-    cashflow: pd.DataFrame
+    _yf_ticker: Any = field(default=None, repr=False, compare=False)
+    
+    def _statement(self, attr: str) -> pd.DataFrame:
+        if self._yf_ticker is None:
+            return pd.DataFrame()
+        return getattr(self._yf_ticker, attr)
+    
+    @cached_property
+    def balance_sheet(self) -> pd.DataFrame:
+        return self._statement('quarterly_balance_sheet')
     
-    @property
+    @cached_property
+    def income_stmt(self) -> pd.DataFrame:
+        return self._statement('quarterly_income_stmt')
+    
+    @cached_property
+    def cashflow(self) -> pd.DataFrame:
+        return self._statement('quarterly_cashflow')
+    
+    @cached_property
     def nome(self) -> str:
         return self.info.get('longName', self.info.get('shortName', self.ticker))
     
-    @property
+    @cached_property
     def setor(self) -> str:
         return self.info.get('sector', 'N/A')
     
-    @property
+    @cached_property
     def market_cap(self) -> float:
         return self.info.get('marketCap', 0)
     
-    @property
+    @cached_property
     def price(self) -> float:
         return self.info.get('currentPrice', 0)
     
-    @property
+    @cached_property
     def pl_trailing(self) -> float | None:
         return self.info.get('trailingPE')
     
-    @property
+    @cached_property
     def pl_forward(self) -> float | None:
         return self.info.get('forwardPE')
     
-    @property
+    @cached_property
     def pvp(self) -> float | None:
         return self.info.get('priceToBook')
     
-    @property
+    @cached_property
     def roe(self) -> float | None:
         return self.info.get('returnOnEquity')
     
-    @property
+    @cached_property
     def roa(self) -> float | None:
         return self.info.get('returnOnAssets')
     
-    @property
+    @cached_property
     def dividend_yield(self) -> float | None:
         return self.info.get('dividendYield')
     
-    @property
+    @cached_property
     def eps_trailing(self) -> float | None:
         return self.info.get('trailingEps')
     
-    @property
+    @cached_property
     def book_value(self) -> float | None:
         return self.info.get('bookValue')
     
-    @property
+    @cached_property
     def target_price_mean(self) -> float | None:
         return self.info.get('targetMeanPrice')
     
-    @property
+    @cached_property
     def recommendation(self) -> str:
         return self.info.get('recommendationKey', 'N/A')
     
     def to_dict(self) -> dict[str, Any]:
         """Converte dados para dicionário para serialização."""
+        info = self.info
         return {
             'ticker': self.ticker,
             'nome': self.nome,
-            'setor': self.setor,
-            'industria': self.info.get('industry'),
-            'market_cap': self.market_cap,
-            'enterprise_value': self.info.get('enterpriseValue'),
-            'price': self.price,
-            'pl_trailing': self.pl_trailing,
-            'pl_forward': self.pl_forward,
-            'pvp': self.pvp,
-            'ev_ebitda': self.info.get('enterpriseToEbitda'),
-            'dividend_yield': self.dividend_yield,
-            'dividend_rate': self.info.get('dividendRate'),
-            'payout_ratio': self.info.get('payoutRatio'),
-            'roe': self.roe,
-            'roa': self.roa,
-            'margem_liquida': self.info.get('profitMargins'),
-            'margem_operacional': self.info.get('operatingMargins'),
-            'crescimento_lucro_5a': self.info.get('earningsQuarterlyGrowth'),
-            'crescimento_receita': self.info.get('revenueGrowth'),
-            'eps_trailing': self.eps_trailing,
-            'eps_forward': self.info.get('forwardEps'),
-            'book_value': self.book_value,
-            'shares_outstanding': self.info.get('sharesOutstanding'),
-            'float_shares': self.info.get('floatShares'),
-            'target_price_mean': self.target_price_mean,
-            'target_price_low': self.info.get('targetLowPrice'),
-            'target_price_high': self.info.get('targetHighPrice'),
-            'recommendation': self.recommendation,
+            **{out: info.get(key, default) for out, key, default in _FIELD_MAP},
         }
 
 
@@ -148,49 +189,75 @@ class FundamentalsLoader:
             config: Configuração do projeto. Se None, usa singleton.
         """
         self.config = config or get_config()
+        self._session = get_cached_session("yahoo_fundamentals", FUNDAMENTALS_CACHE_TTL)
+    
+    def clear_cache(self) -> None:
+        """Descarta as respostas de fundamentos armazenadas em data/cache/."""
+        clear_session_cache(self._session)
+        get_ticker.cache_clear()
         
     def fetch_fundamentals(self, ticker: str) -> FundamentalsData:
         """
         Obtém dados fundamentais completos de uma ação.
         
+        Apenas `info` é baixado aqui; balanço, DRE e DFC são carregados
+        sob demanda ao acessar os respectivos atributos.
+        
         Args:
             ticker: Código do ticker (ex: "PETR4.SA")
             
         Returns:
             FundamentalsData com todos os dados fundamentais
         """
-        yf_ticker = yf.Ticker(ticker)
+        yf_ticker = get_ticker(yf, ticker, self._session)
         
         return FundamentalsData(
             ticker=ticker,
             info=yf_ticker.info,
-            balance_sheet=yf_ticker.quarterly_balance_sheet,
-            income_stmt=yf_ticker.quarterly_income_stmt,
-            cashflow=yf_ticker.quarterly_cashflow,
+            _yf_ticker=yf_ticker,
         )
     
-    def fetch_multiple(self, tickers: list[str]) -> dict[str, FundamentalsData]:
+    def fetch_multiple(
+        self,
+        tickers: list[str],
+        threads: int | None = None,
+    ) -> dict[str, FundamentalsData]:
         """
         Obtém dados fundamentais de múltiplos tickers.
         
+        As requisições são disparadas em paralelo, pois o tempo é dominado
+        pela latência de rede de cada ticker.
+        
         Args:
             tickers: Lista de códigos de ticker
+            threads: Número de threads (padrão: min(MAX_FETCH_WORKERS, len(tickers)));
+                use 1 para buscar sequencialmente
             
         Returns:
-            Dicionário mapeando ticker -> FundamentalsData
+            Dicionário mapeando ticker -> FundamentalsData, na ordem de `tickers`
         """
-        results = {}
-        for ticker in tickers:
-            try:
-                results[ticker] = self.fetch_fundamentals(ticker)
-            except Exception as e:
-                print(f"Erro ao obter dados de {ticker}: {e}")
-        return results
+        if not tickers:
+            return {}
+        
+        workers = threads or min(MAX_FETCH_WORKERS, len(tickers))
+        
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.fetch_fundamentals, t): t for t in tickers}
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    fetched[ticker] = future.result()
+                except Exception as e:
+                    print(f"Erro ao obter dados de {ticker}: {e}")
+        
+        return {ticker: fetched[ticker] for ticker in tickers if ticker in fetched}
     
     def fetch_peer_comparison(
         self,
         principal: str,
-        peers: list[str]
+        peers: list[str],
+        threads: int | None = None,
     ) -> pd.DataFrame:
         """
         Cria tabela comparativa entre ação principal e pares.
@@ -198,36 +265,46 @@ class FundamentalsLoader:
         Args:
             principal: Ticker da ação principal
             peers: Lista de tickers dos pares
+            threads: Número de threads repassado a fetch_multiple
             
         Returns:
             DataFrame com comparação de métricas
         """
         all_tickers = [principal] + peers
-        all_data = self.fetch_multiple(all_tickers)
-        
-        comparison_data = []
-        for ticker, data in all_data.items():
-            comparison_data.append({
-                'ticker': ticker,
-                'nome': data.nome,
-                'market_cap_bi': data.market_cap / 1e9,
-                'price': data.price,
-                'pl': data.pl_trailing,
-                'pvp': data.pvp,
-                'roe': (data.roe or 0) * 100,
-                'dividend_yield': (data.dividend_yield or 0) * 100,
-                'eps': data.eps_trailing,
-                'book_value': data.book_value,
-                'recommendation': data.recommendation,
-            })
-        
-        df = pd.DataFrame(comparison_data)
-        return df.set_index('ticker')
+        all_data = self.fetch_multiple(all_tickers, threads=threads)
+        
+        # Apenas os campos da tabela, lidos direto de info (sem to_dict completo)
+        infos = [data.info for data in all_data.values()]
+        
+        def column(key: str, default: Any = None, zero_if_missing: bool = False) -> np.ndarray:
+            # None ou texto não numérico -> NaN (ou 0.0 com zero_if_missing)
+            values = pd.to_numeric(
+                pd.Series([info.get(key, default) for info in infos], dtype=object),
+                errors='coerce',
+            ).to_numpy(dtype=float)
+            return np.where(np.isnan(values), 0.0, values) if zero_if_missing else values
+        
+        return pd.DataFrame(
+            {
+                'nome': [data.nome for data in all_data.values()],
+                'market_cap_bi': column('marketCap', 0) / 1e9,
+                'price': column('currentPrice', 0),
+                'pl': column('trailingPE'),
+                'pvp': column('priceToBook'),
+                'roe': column('returnOnEquity', zero_if_missing=True) * 100,
+                'dividend_yield': column('dividendYield', zero_if_missing=True) * 100,
+                'eps': column('trailingEps'),
+                'book_value': column('bookValue'),
+                'recommendation': [info.get('recommendationKey', 'N/A') for info in infos],
+            },
+            index=pd.Index(list(all_data), name='ticker'),
+        )
     
     def save_to_external(
         self,
         data: FundamentalsData,
-        prefix: str = ""
+        prefix: str = "",
+        format: Literal['parquet', 'csv'] = 'parquet',
     ) -> dict[str, Path]:
         """
         Salva demonstrativos financeiros em data/external/yahoo_finance/.
@@ -235,6 +312,7 @@ class FundamentalsLoader:
         Args:
             data: Dados fundamentais a salvar
             prefix: Prefixo para nomes de arquivo (padrão: ticker)
+            format: "parquet" (padrão, zstd) ou "csv" para inspeção manual
             
         Returns:
             Dicionário com caminhos dos arquivos salvos
@@ -245,66 +323,61 @@ class FundamentalsLoader:
         output_dir = self.config.paths.external_yahoo
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        saved_files = {}
-        
-        # Balanço Patrimonial
-        if not data.balance_sheet.empty:
-            path = output_dir / f"balance_sheet_{prefix}.csv"
-            data.balance_sheet.to_csv(path)
-            saved_files['balance_sheet'] = path
+        # Balanço Patrimonial, DRE e Fluxo de Caixa
+        statements = ('balance_sheet', 'income_stmt', 'cashflow')
         
-        # DRE
-        if not data.income_stmt.empty:
-            path = output_dir / f"income_stmt_{prefix}.csv"
-            data.income_stmt.to_csv(path)
-            saved_files['income_stmt'] = path
+        def save(name: str) -> tuple[str, Path | None]:
+            # O acesso ao atributo dispara o download sob demanda do demonstrativo
+            df = getattr(data, name)
+            if df.empty:
+                return name, None
+            return name, write_frame(df, output_dir / f"{name}_{prefix}", format, index=True)
         
-        # Fluxo de Caixa
-        if not data.cashflow.empty:
-            path = output_dir / f"cashflow_{prefix}.csv"
-            data.cashflow.to_csv(path)
-            saved_files['cashflow'] = path
+        # Downloads e gravações dos três demonstrativos em paralelo
+        with ThreadPoolExecutor(max_workers=len(statements)) as executor:
+            results = list(executor.map(save, statements))
         
-        return saved_files
+        return {name: path for name, path in results if path is not None}
     
     def save_to_processed(
         self,
         data: FundamentalsData,
-        filename: str | None = None
+        filename: str | None = None,
+        format: Literal['parquet', 'csv'] = 'parquet',
     ) -> Path:
         """
         Salva dados fundamentais consolidados em data/processed/.
         
         Args:
             data: Dados fundamentais a salvar
-            filename: Nome do arquivo (padrão: fundamentals_{ticker}.csv)
+            filename: Nome do arquivo sem extensão (padrão: fundamentals_{ticker})
+            format: "parquet" (padrão, zstd) ou "csv" para inspeção manual
             
         Returns:
             Caminho do arquivo salvo
         """
         ticker_clean = data.ticker.replace('.SA', '').lower()
-        filename = filename or f"fundamentals_{ticker_clean}.csv"
+        filename = filename or f"fundamentals_{ticker_clean}"
         
         output_dir = self.config.paths.data_processed
         output_dir.mkdir(parents=True, exist_ok=True)
         
         df = pd.DataFrame([data.to_dict()])
-        output_path = output_dir / filename
-        df.to_csv(output_path, index=False)
-        
-        return output_path
+        return write_frame(df, output_dir / filename, format)
     
     def save_peer_comparison(
         self,
         df_peers: pd.DataFrame,
-        filename: str = "fundamentals_peers.csv"
+        filename: str = "fundamentals_peers",
+        format: Literal['parquet', 'csv'] = 'parquet',
     ) -> Path:
         """
         Salva comparação com pares em data/processed/.
         
         Args:
             df_peers: DataFrame com dados dos pares
-            filename: Nome do arquivo
+            filename: Nome do arquivo sem extensão
+            format: "parquet" (padrão, zstd) ou "csv" para inspeção manual
             
         Returns:
             Caminho do arquivo salvo
@@ -312,10 +385,7 @@ class FundamentalsLoader:
         output_dir = self.config.paths.data_processed
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        output_path = output_dir / filename
-        df_peers.to_csv(output_path)
-        
-        return output_path
+        return write_frame(df_peers, output_dir / filename, format, index=True)
     
     def analyze_relative_position(
         self,
@@ -338,30 +408,27 @@ class FundamentalsLoader:
             'ROE (%)': 'roe',
         }
         
-        analysis = {}
-        for metric_name, col in metrics.items():
-            principal_val = df_peers.loc[principal_ticker, col]
-            peers_mean = df_peers.drop(principal_ticker)[col].mean()
-            
-            if peers_mean != 0:
-                diff_pct = ((principal_val - peers_mean) / peers_mean) * 100
-            else:
-                diff_pct = 0
-            
-            # Determinar status
-            if diff_pct < -10:
-                status = 'BARATO'
-            elif diff_pct > 10:
-                status = 'CARO'
-            else:
-                status = 'NEUTRO'
-            
-            analysis[metric_name] = {
-                'principal': principal_val,
-                'peers_mean': peers_mean,
-                'diff_pct': diff_pct,
-                'status': status,
+        cols = list(metrics.values())
+        
+        # Médias dos pares e diferenças calculadas para todas as métricas de uma vez
+        principal_vals = df_peers.loc[principal_ticker, cols].astype(float)
+        peers_means = df_peers.drop(principal_ticker)[cols].mean()
+        diff_pct = ((principal_vals - peers_means) / peers_means * 100).where(peers_means != 0, 0.0)
+        
+        # Determinar status
+        status = np.select(
+            [diff_pct < -10, diff_pct > 10], ['BARATO', 'CARO'], default='NEUTRO'
+        )
+        
+        analysis = {
+            metric_name: {
+                'principal': principal_vals[col],
+                'peers_mean': peers_means[col],
+                'diff_pct': diff_pct[col],
+                'status': status[i],
             }
+            for i, (metric_name, col) in enumerate(metrics.items())
+        }
         
         return analysis
 
@@ -0,0 +1,258 @@
+"""
+Sessões HTTP compartilhadas pelos loaders de dados externos.
+
+Centraliza a criação de `requests.Session` usadas por Yahoo Finance,
+BCB SGS e fundamentos, incluindo o cache persistente em disco
+(requests_cache, opcional) para que execuções repetidas do pipeline
+não refaçam as mesmas requisições, e a última cópia válida de cada
+dataset para quando a fonte estiver fora do ar.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Type
+
+from src.core.config import get_config
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import requests
+
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+# Validade das respostas em cache por fonte
+PRICES_CACHE_TTL = timedelta(days=1)
+FUNDAMENTALS_CACHE_TTL = timedelta(days=7)
+BCB_CACHE_TTL = timedelta(hours=1)
+
+# Pool de conexões keep-alive (pool_maxsize >= threads de yf.download/fetch_multiple)
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = 32
+
+
+# =============================================================================
+# SESSÕES
+# =============================================================================
+
+_SHARED_SESSION: Optional[requests.Session] = None
+_CACHED_SESSIONS: Dict[str, requests.Session] = {}
+_YF_ACCEPTS_SESSION: Optional[bool] = None
+
+
+def _mount_pool(session: requests.Session) -> requests.Session:
+    """Monta adapter com pool de conexões e retry na sessão."""
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=Retry(total=3, backoff_factor=0.3),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_shared_session() -> requests.Session:
+    """
+    Retorna a sessão keep-alive compartilhada por todos os loaders.
+
+    Reaproveita conexões TCP/TLS entre chamadas e instâncias, evitando
+    um novo handshake por requisição.
+    """
+    global _SHARED_SESSION
+    if _SHARED_SESSION is None:
+        import requests
+        _SHARED_SESSION = _mount_pool(requests.Session())
+    return _SHARED_SESSION
+
+
+def get_cached_session(name: str, expire_after: timedelta) -> requests.Session:
+    """
+    Retorna sessão HTTP com cache sqlite em data/cache/{name}.sqlite.
+
+    Respostas vencidas continuam sendo servidas se a fonte falhar
+    (stale_if_error). Sem requests_cache instalado, retorna a sessão
+    compartilhada de get_shared_session() (sem cache). Sessões são reaproveitadas por nome
+    dentro do processo e usam o mesmo pool de conexões keep-alive.
+
+    Args:
+        name: Nome do cache (ex: "yahoo_finance").
+        expire_after: Validade das respostas armazenadas.
+
+    Returns:
+        Sessão HTTP (CachedSession quando disponível).
+    """
+    session = _CACHED_SESSIONS.get(name)
+    if session is not None:
+        return session
+
+    try:
+        import requests_cache
+    except ImportError:
+        logger.debug("requests_cache não instalado; sessão %s sem cache", name)
+        session = get_shared_session()
+    else:
+        cache_dir = get_config().paths.data_cache
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        session = _mount_pool(requests_cache.CachedSession(
+            cache_name=str(cache_dir / name),
+            backend="sqlite",
+            expire_after=expire_after,
+            # Respostas expiradas são revalidadas (ETag/Last-Modified) e
+            # servidas mesmo vencidas se a fonte falhar
+            stale_if_error=True,
+        ))
+
+    _CACHED_SESSIONS[name] = session
+    return session
+
+
+def get_sgs_session() -> requests.Session:
+    """Sessão com cache única para a API JSON do BCB SGS (data/cache/bcb_sgs)."""
+    return get_cached_session("bcb_sgs", BCB_CACHE_TTL)
+
+
+def fetch_sgs_json(code: int, start: str, end: str) -> Any:
+    """
+    Busca uma série do BCB SGS e devolve o JSON bruto.
+
+    Ponto único de acesso ao SGS (BCBLoader e fetch_cdi), pela sessão de
+    get_sgs_session(); cada chamador converte os registros
+    [{"data": "dd/mm/aaaa", "valor": "..."}] no formato de que precisa.
+
+    Args:
+        code: Código da série no SGS.
+        start: Data inicial (dd/mm/aaaa).
+        end: Data final (dd/mm/aaaa).
+
+    Returns:
+        Lista de registros da série.
+    """
+    url = (
+        f"{get_config().env.bcb_sgs_base_url}.{code}/dados"
+        f"?formato=json&dataInicial={start}&dataFinal={end}"
+    )
+    response = get_sgs_session().get(url, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def clear_session_cache(session: requests.Session) -> None:
+    """Remove as respostas armazenadas de uma sessão (no-op sem cache)."""
+    cache = getattr(session, "cache", None)
+    if cache is not None:
+        cache.clear()
+
+
+def yf_session_kwargs(yf: Any, session: requests.Session) -> Dict[str, Any]:
+    """
+    Retorna {"session": session} se o yfinance instalado aceitar a sessão.
+
+    Versões recentes do yfinance exigem sessão curl_cffi e rejeitam
+    `requests.Session`; nesse caso as chamadas seguem sem sessão própria.
+    """
+    global _YF_ACCEPTS_SESSION
+    if _YF_ACCEPTS_SESSION is None:
+        try:
+            yf.Ticker("^BVSP", session=session)
+            _YF_ACCEPTS_SESSION = True
+        except Exception as e:  # noqa: BLE001
+            logger.warning(f"yfinance não aceita requests.Session ({e}); cache HTTP desativado")
+            _YF_ACCEPTS_SESSION = False
+    return {"session": session} if _YF_ACCEPTS_SESSION else {}
+
+
+@functools.lru_cache(maxsize=256)
+def get_ticker(yf: Any, symbol: str, session: requests.Session) -> Any:
+    """
+    Retorna `yf.Ticker(symbol)` memoizado por (símbolo, sessão).
+
+    Evita reconstruir o objeto quando o mesmo ativo é consultado mais de
+    uma vez no processo (preços, fundamentos, retornos). A sessão faz
+    parte da chave, então trocar de sessão gera um novo Ticker.
+    Use `get_ticker.cache_clear()` para descartar os objetos (e os dados
+    que o yfinance guarda neles).
+    """
+    return yf.Ticker(symbol, **yf_session_kwargs(yf, session))
+
+
+# =============================================================================
+# ÚLTIMA CÓPIA VÁLIDA
+# =============================================================================
+
+def source_errors() -> Tuple[Type[BaseException], ...]:
+    """
+    Exceções que indicam fonte indisponível (rede, HTTP, rate limit).
+
+    Inclui `requests.RequestException`, erros de conexão/timeout e, se o
+    yfinance instalado os define, seus erros de rate limit. Erros de
+    parsing ou de programação ficam de fora e não devem ser mascarados
+    por uma cópia antiga.
+    """
+    import requests
+
+    errors: Tuple[Type[BaseException], ...] = (
+        requests.RequestException, ConnectionError, TimeoutError,
+    )
+    try:
+        from yfinance.exceptions import YFRateLimitError
+    except ImportError:
+        return errors
+    return errors + (YFRateLimitError,)
+
+
+def fetch_with_fallback(
+    name: str,
+    fetch: Callable[[], pd.DataFrame],
+    errors: Optional[Tuple[Type[BaseException], ...]] = None,
+) -> pd.DataFrame:
+    """
+    Executa fetch() e guarda o resultado em data/cache/{name}.parquet.
+
+    Se fetch() falhar com uma das exceções de `errors` (rate limit, 401,
+    fonte fora do ar) ou vier vazio, devolve a última cópia válida salva,
+    com aviso no log. Sem cópia salva, a exceção original é propagada (ou
+    o resultado vazio devolvido); exceções fora de `errors` sempre são.
+
+    Args:
+        name: Nome do dataset (ex: "macro_yahoo").
+        fetch: Função sem argumentos que coleta o DataFrame.
+        errors: Exceções tratadas como fonte indisponível (default:
+            source_errors()).
+
+    Returns:
+        DataFrame coletado ou a última cópia válida.
+    """
+    import pandas as pd
+
+    if errors is None:
+        errors = source_errors()
+    path = get_config().paths.data_cache / f"{name}.parquet"
+    try:
+        df = fetch()
+    except errors as e:
+        if not path.exists():
+            raise
+        logger.warning(f"Falha ao coletar {name} ({e}); usando última cópia de {path}")
+        return pd.read_parquet(path)
+
+    if df.empty:
+        if path.exists():
+            logger.warning(f"{name} veio vazio; usando última cópia de {path}")
+            return pd.read_parquet(path)
+        return df
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(path, engine="pyarrow", compression="zstd")
+    return df
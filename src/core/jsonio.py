@@ -0,0 +1,59 @@
+"""
+Leitura e escrita de JSON com orjson opcional.
+
+Usa orjson (extra "perf") quando instalado e recai no módulo json da
+biblioteca padrão caso contrário. Não depende de outros módulos do
+projeto, então pode ser importado por config.py sem ciclos.
+"""
+
+import json
+from pathlib import Path
+from typing import Any
+
+try:
+    import orjson as _orjson
+except ImportError:  # orjson é opcional (extra "perf")
+    _orjson = None
+
+
+def json_loads(payload: bytes) -> Any:
+    """Decodifica JSON a partir de bytes (orjson quando disponível)."""
+    if _orjson is not None:
+        return _orjson.loads(payload)
+    return json.loads(payload)
+
+
+def json_dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+    """
+    Serializa objeto em JSON (bytes UTF-8), via orjson quando disponível.
+
+    Args:
+        obj: Objeto a serializar (tipos não suportados viram str).
+        indent: Se True, indenta com 2 espaços (legível, porém maior).
+
+    Returns:
+        JSON codificado em UTF-8.
+    """
+    if _orjson is not None:
+        option = _orjson.OPT_SERIALIZE_NUMPY | _orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= _orjson.OPT_INDENT_2
+        return _orjson.dumps(obj, option=option, default=str)
+    return json.dumps(
+        obj, ensure_ascii=False, indent=2 if indent else None, default=str
+    ).encode("utf-8")
+
+
+def write_json(path: Path, obj: Any, indent: bool = False) -> None:
+    """
+    Grava objeto como JSON em `path`.
+
+    Com orjson, serializa em um único buffer de bytes (C); sem orjson,
+    usa json.dump escrevendo incrementalmente no arquivo, sem montar a
+    string completa em memória.
+    """
+    if _orjson is not None:
+        path.write_bytes(json_dumps_bytes(obj, indent=indent))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2 if indent else None, default=str)
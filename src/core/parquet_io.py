@@ -0,0 +1,96 @@
+"""
+Leitura e gravação de parquet compartilhadas pelos loaders, processamento e modelos.
+
+Os datasets intermediários (returns, ml_dataset, fundamentos) são relidos
+por várias etapas do pipeline; a leitura via pyarrow com memory map
+aproveita o page cache do sistema operacional entre essas etapas.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Literal, Optional, Union
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def read_parquet(
+    path: Union[str, Path],
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Lê um parquet como DataFrame (equivalente a pd.read_parquet).
+
+    O arquivo é mapeado em memória (memory_map=True) e a conversão
+    Arrow → pandas libera cada coluna Arrow à medida que é convertida
+    (self_destruct), reduzindo o pico de memória pela metade. O índice
+    salvo pelo pandas é restaurado a partir dos metadados.
+
+    Args:
+        path: Caminho do arquivo parquet.
+        columns: Colunas a ler (None = todas).
+
+    Returns:
+        DataFrame com as colunas solicitadas.
+    """
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=columns, memory_map=True, use_pandas_metadata=True)
+    return table.to_pandas(self_destruct=True, split_blocks=True, use_threads=True)
+
+
+def read_available_columns(
+    path: Union[str, Path],
+    columns: List[str],
+) -> pd.DataFrame:
+    """
+    Lê apenas as colunas de `columns` presentes no schema do parquet.
+
+    Útil quando parte das colunas é opcional (ex: campos de fundamentos
+    que nem toda fonte fornece): as ausentes são ignoradas em vez de
+    gerar erro na leitura.
+    """
+    import pyarrow.parquet as pq
+
+    available = set(pq.read_schema(path).names)
+    return read_parquet(path, columns=[c for c in columns if c in available])
+
+
+def write_frame(
+    df: pd.DataFrame,
+    path: Union[str, Path],
+    format: Literal["parquet", "csv"] = "parquet",
+    index: bool = False,
+) -> Path:
+    """
+    Grava DataFrame em `path` + extensão do formato (Parquet zstd ou CSV).
+
+    A extensão é acrescentada ao nome (não substituída), preservando
+    nomes com ponto como "prices_PETR4.SA". Rótulos de coluna não
+    textuais (ex: datas dos demonstrativos) são convertidos para str,
+    como exige o Parquet.
+
+    Args:
+        df: DataFrame a gravar.
+        path: Caminho sem extensão.
+        format: "parquet" (padrão, zstd) ou "csv" para inspeção manual.
+        index: Grava também o índice do DataFrame.
+
+    Returns:
+        Caminho efetivamente gravado.
+
+    Raises:
+        ValueError: Formato não suportado.
+    """
+    path = Path(path)
+    path = path.with_name(f"{path.name}.{format}")
+    if format == "parquet":
+        df.rename(columns=str).to_parquet(
+            path, engine="pyarrow", compression="zstd", index=index
+        )
+    elif format == "csv":
+        df.to_csv(path, index=index)
+    else:
+        raise ValueError(f"Formato não suportado: {format}")
+    return path
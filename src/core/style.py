@@ -5,8 +5,25 @@ Padrão visual acadêmico/profissional utilizando Seaborn como base,
 alinhado com Times New Roman (ABNT) e paleta de cores otimizada.
 """
 
-import matplotlib.pyplot as plt
-import seaborn as sns
+import importlib
+from functools import lru_cache
+
+# matplotlib/seaborn são importados sob demanda: COLORS pode ser usado sem
+# pagar o custo de importação de pyplot + seaborn
+_LAZY_MODULES = {
+    'plt': 'matplotlib.pyplot',
+    'mpl': 'matplotlib',
+    'sns': 'seaborn',
+}
+
+
+def __getattr__(name):
+    """Importa plt/mpl/sns no primeiro acesso (PEP 562)."""
+    if name in _LAZY_MODULES:
+        module = importlib.import_module(_LAZY_MODULES[name])
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ==============================================================================
 # PALETA DE CORES - Profissional e acessível
@@ -29,11 +46,86 @@ COLORS = {
     'grid': '#dddddd',         # Cinza Claro
 }
 
+# ==============================================================================
+# RC PARAMS - Customizações aplicadas sobre o tema Seaborn
+# ==============================================================================
+
+STYLE_CONFIG = {
+    # Tipografia
+    'font.family': 'serif',
+    # font.serif é resolvido em set_style() para uma única família instalada
+    'font.size': 12,
+    'axes.labelsize': 12,
+    'axes.titlesize': 14,
+    'xtick.labelsize': 10,
+    'ytick.labelsize': 10,
+    'legend.fontsize': 10,
+    'figure.titlesize': 16,
+    
+    # Cores e Linhas
+    'axes.labelcolor': COLORS['text'],
+    'axes.titlecolor': COLORS['text'],
+    'axes.edgecolor': COLORS['grid'],
+    'grid.color': COLORS['grid'],
+    'grid.linestyle': '--',
+    'grid.alpha': 0.6,
+    
+    # Layout
+    'figure.figsize': (10, 6),
+    'figure.dpi': 300,
+    'savefig.dpi': 300,
+    'savefig.bbox': 'tight',
+    'savefig.pad_inches': 0.1,
+    
+    # Legenda
+    'legend.frameon': True,
+    'legend.framealpha': 0.9,
+    'legend.facecolor': 'white',
+    'legend.edgecolor': '#cccccc',
+    'legend.fancybox': True,
+}
+
+
+# Famílias serifadas em ordem de preferência (ABNT: Times)
+SERIF_PREFERENCE = ('TeX Gyre Termes', 'Times New Roman', 'DejaVu Serif')
+
+
+@lru_cache(maxsize=1)
+def _serif_family():
+    """
+    Primeira família de SERIF_PREFERENCE instalada, resolvida uma única vez.
+
+    Com uma só entrada em font.serif o findfont não percorre a cadeia de
+    fallback a cada objeto de texto.
+    """
+    from matplotlib import font_manager
+    
+    for family in SERIF_PREFERENCE:
+        try:
+            font_manager.findfont(family, fallback_to_default=False)
+        except ValueError:
+            continue
+        return family
+    return 'DejaVu Serif'
+
+
+@lru_cache(maxsize=1)
+def _prop_cycle():
+    """Ciclo de cores da paleta "deep", construído uma única vez por processo."""
+    from cycler import cycler
+    import seaborn as sns
+    
+    return cycler('color', sns.color_palette("deep"))
+
+
 def set_style():
     """
     Aplica o estilo global 'State of the Art' para todos os gráficos.
     Deve ser chamado no início de cada script de geração de figura.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
     # Resetar configurações anteriores
     plt.rcParams.update(plt.rcParamsDefault)
     
@@ -41,44 +133,15 @@ def set_style():
     sns.set_theme(style="whitegrid", context="paper")
     
     # Customizações Finas (RC Params)
-    plt.rcParams.update({
-        # Tipografia
-        'font.family': 'serif',
-        'font.serif': ['Times New Roman', 'DejaVu Serif', 'serif'],
-        'font.size': 12,
-        'axes.labelsize': 12,
-        'axes.titlesize': 14,
-        'xtick.labelsize': 10,
-        'ytick.labelsize': 10,
-        'legend.fontsize': 10,
-        'figure.titlesize': 16,
-        
-        # Cores e Linhas
-        'axes.labelcolor': COLORS['text'],
-        'axes.titlecolor': COLORS['text'],
-        'axes.edgecolor': COLORS['grid'],
-        'grid.color': COLORS['grid'],
-        'grid.linestyle': '--',
-        'grid.alpha': 0.6,
-        
-        # Layout
-        'figure.figsize': (10, 6),
-        'figure.dpi': 300,
-        'savefig.dpi': 300,
-        'savefig.bbox': 'tight',
-        'savefig.pad_inches': 0.1,
-        
-        # Legenda
-        'legend.frameon': True,
-        'legend.framealpha': 0.9,
-        'legend.facecolor': 'white',
-        'legend.edgecolor': '#cccccc',
-        'legend.fancybox': True,
-    })
+    plt.rcParams.update(STYLE_CONFIG)
+    plt.rcParams['font.serif'] = [_serif_family()]
     
-    # Definir paleta padrão do Seaborn
-    sns.set_palette(sns.color_palette("deep"))
+    # Definir paleta padrão do Seaborn (mesmo efeito de sns.set_palette("deep"))
+    plt.rcParams['axes.prop_cycle'] = _prop_cycle()
 
+@lru_cache(maxsize=8)
 def get_palette(n_colors=6):
-    """Retorna a paleta de cores padrão."""
-    return sns.color_palette("deep", n_colors)
+    """Retorna a paleta de cores padrão (tupla imutável, memoizada por n_colors)."""
+    import seaborn as sns
+    
+    return tuple(sns.color_palette("deep", n_colors))
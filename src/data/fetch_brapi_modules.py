@@ -4,25 +4,31 @@ Coleta todos os módulos BRAPI disponíveis para o ticker principal e salva payl
 
 from __future__ import annotations
 
-import json
 import logging
+import sys
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 
 from src.core.brapi_loader import BrapiLoader, AVAILABLE_MODULES
+from src.core.jsonio import write_json
 from src.core.config import get_config, Config
 
 logger = logging.getLogger(__name__)
 
 
-def flatten_default_keystats(raw: Dict[str, Any]) -> pd.DataFrame:
+def flatten_default_keystats(raw: Dict[str, Any]) -> Optional[pa.Table]:
+    """Tabela Arrow de 1 linha (uma coluna por estatística), ou None se ausente."""
     stats = raw.get("defaultKeyStatistics") or raw.get("defaultKeyStatisticsHistory") or {}
-    return pd.DataFrame([stats]) if isinstance(stats, dict) else pd.DataFrame()
+    if not isinstance(stats, dict) or not stats:
+        return None
+    return pa.Table.from_pydict({k: [v] for k, v in stats.items()})
 
 
-def run() -> None:
+def run(write_csv: bool = False) -> None:
     logging.basicConfig(level=logging.INFO)
     cfg: Config = get_config()
     loader = BrapiLoader(cfg)
@@ -37,15 +43,20 @@ def run() -> None:
     processed_dir.mkdir(parents=True, exist_ok=True)
     raw_dir.mkdir(parents=True, exist_ok=True)
 
-    raw_path = raw_dir / f"brapi_full_{ticker.replace('.SA','').lower()}.json"
-    raw_path.write_text(json.dumps(quote.raw_response, ensure_ascii=False, indent=2))
+    raw = quote.raw_response
+    del quote  # apenas o payload é usado daqui em diante
 
-    df_stats = flatten_default_keystats(quote.raw_response)
-    if not df_stats.empty:
-        df_stats.to_parquet(processed_dir / "brapi_stats.parquet", index=False)
-        df_stats.to_csv(processed_dir / "brapi_stats.csv", index=False)
+    raw_path = raw_dir / f"brapi_full_{ticker.replace('.SA','').lower()}.json"
+    # JSON indentado só fora de produção (ENVIRONMENT != "production")
+    write_json(raw_path, raw, indent=cfg.env.environment != "production")
+
+    stats = flatten_default_keystats(raw)
+    if stats is not None:
+        pq.write_table(stats, processed_dir / "brapi_stats.parquet", compression="zstd")
+        if write_csv:
+            pa_csv.write_csv(stats, processed_dir / "brapi_stats.csv")
     logger.info("BRAPI full payload salvo em %s", raw_path)
 
 
 if __name__ == "__main__":
-    run()
+    run(write_csv="--csv" in sys.argv[1:])
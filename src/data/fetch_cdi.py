@@ -6,50 +6,110 @@ Saídas:
     - data/external/bcb/cdi_raw.parquet
 
 Execute a partir da raiz do projeto:
-    python -m src.data.fetch_cdi
+    python -m src.data.fetch_cdi [--refresh]
 """
 
 from __future__ import annotations
 
 import logging
+import sys
 from pathlib import Path
 from typing import Tuple, Optional
 
+import numpy as np
 import pandas as pd
-import requests
 
 from src.core.config import get_config, Config
+from src.core.http_session import fetch_sgs_json
 
 logger = logging.getLogger(__name__)
 
 # Ordem de tentativa para séries CDI/DI no SGS
 CDI_SERIES_ORDER = [4389, 12, 11, 4391]  # 4391 = Selic diária como último recurso
 
+# Defasagem de publicação do SGS: dias úteis sem observação coletados há
+# mais que isso são feriados (não dados ainda por publicar)
+SGS_PUBLICATION_LAG = pd.offsets.BDay(3)
+
 
 def _fetch_sgs_series(series_code: int, start: str, end: str) -> pd.DataFrame:
     """Busca série do SGS em formato JSON e converte para DataFrame."""
-    config = get_config()
-    base_url = config.env.bcb_sgs_base_url
-    url = (
-        f"{base_url}.{series_code}/dados"
-        f"?formato=json&dataInicial={start}&dataFinal={end}"
+    data = fetch_sgs_json(series_code, start, end)
+    # Conversão direta das colunas: datas como texto fixo e valores já em float
+    dates = np.array([d["data"] for d in data], dtype="U10")
+    values = np.fromiter(
+        (float(d["valor"].replace(",", ".")) for d in data),
+        dtype=np.float64,
+        count=len(data),
     )
-    response = requests.get(url, timeout=30)
-    response.raise_for_status()
-    data = response.json()
-    df = pd.DataFrame(data)
+    df = pd.DataFrame({"data": dates, "valor": values})
     return df
 
 
-def fetch_cdi(preferred_series: Optional[int] = None) -> Tuple[pd.DataFrame, int]:
+def _set_gap_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Preenche as contagens de dias úteis sem dado (brutos e pós-ffill) de df."""
+    df["missing_business_days_raw"] = int((~df["observed"]).sum())
+    df["missing_business_days_after_ffill"] = int(df["cdi_daily"].isna().sum())
+    return df
+
+
+def _load_cached_cdi(
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    preferred_series: Optional[int],
+    processed_name: str = "cdi",
+) -> Optional[Tuple[pd.DataFrame, int]]:
+    """Reaproveita external/bcb/{processed_name}_raw.parquet se cobrir [start, end].
+
+    A cópia bruta é salva já preenchida (ffill/bfill), então a cobertura é
+    avaliada pelas observações reais do SGS (coluna `observed`): dias úteis
+    finais sem observação só são aceitos se a coleta ocorreu depois da
+    defasagem de publicação (feriados); senão o SGS é consultado de novo.
+    """
+    raw_path = get_config().paths.external_bcb / f"{processed_name}_raw.parquet"
+    if not raw_path.exists():
+        return None
+
+    df = pd.read_parquet(raw_path)
+    required = {"series_code", "observed", "fetched_on"}
+    if df.empty or not required.issubset(df.columns):
+        return None
+    used_code = int(df["series_code"].iloc[0])
+    if preferred_series and used_code != preferred_series:
+        return None
+    business_days = pd.bdate_range(start=start, end=end)
+    if df["date"].min() > business_days[0] or df["date"].max() < business_days[-1]:
+        return None
+
+    last_observed = df.loc[df["observed"], "date"].max()
+    fetched_on = pd.Timestamp(df["fetched_on"].iloc[0])
+    if last_observed < business_days[-1] and fetched_on <= business_days[-1] + SGS_PUBLICATION_LAG:
+        return None
+
+    df = df[(df["date"] >= start) & (df["date"] <= end)].reset_index(drop=True)
+    logger.info("CDI carregado do cache local %s (série %s)", raw_path, used_code)
+    return _set_gap_columns(df), used_code
+
+
+def fetch_cdi(
+    preferred_series: Optional[int] = None,
+    refresh: bool = False,
+) -> Tuple[pd.DataFrame, int]:
     """Obtém CDI (ou proxy) do BCB SGS entre as datas da análise.
 
-    Tenta séries em ordem CDI_SERIES_ORDER até obter sucesso.
+    Se a cópia bruta salva em external/bcb já cobre o período, ela é usada
+    sem consultar o SGS (use refresh=True para forçar nova coleta).
+    Caso contrário, tenta séries em ordem CDI_SERIES_ORDER até obter sucesso.
     """
     config: Config = get_config()
     start = pd.to_datetime(config.analysis.data_inicio)
     end = pd.to_datetime(config.analysis.data_fim)
 
+    if not refresh:
+        cached = _load_cached_cdi(start, end, preferred_series)
+        if cached is not None:
+            return cached
+
     series_candidates = [preferred_series] if preferred_series else []
     series_candidates.extend([code for code in CDI_SERIES_ORDER if code not in series_candidates])
 
@@ -77,54 +137,79 @@ def fetch_cdi(preferred_series: Optional[int] = None) -> Tuple[pd.DataFrame, int
     if df_raw is None or df_raw.empty or used_code is None:
         raise RuntimeError("Nenhum dado retornado pelo SGS", last_error)
 
-    df_raw["data"] = pd.to_datetime(df_raw["data"], format="%d/%m/%Y")
-    df_raw["valor"] = df_raw["valor"].str.replace(",", ".", regex=False).astype(float)
+    df_raw["data"] = pd.to_datetime(df_raw["data"], format="%d/%m/%Y", cache=True)
 
     df_raw = df_raw.rename(columns={"data": "date", "valor": "rate_percent"})
     df_raw["cdi_annual"] = df_raw["rate_percent"] / 100.0
-    df_raw["cdi_daily"] = (1 + df_raw["cdi_annual"]) ** (1 / 252) - 1
+    # (1 + r)^(1/252) - 1 via log1p/expm1, sem perda de precisão para taxas
+    # pequenas; ufuncs in-place reaproveitam um único buffer
+    daily = np.log1p(df_raw["cdi_annual"].to_numpy(dtype=np.float64))
+    daily *= 1.0 / 252.0
+    np.expm1(daily, out=daily)
+    df_raw["cdi_daily"] = daily
 
     cols = ["date", "cdi_annual", "cdi_daily", "rate_percent"]
     df_raw = df_raw[cols]
 
     business_days = pd.date_range(start=start, end=end, freq="B")
-    raw_unique = df_raw["date"].nunique()
-    df_raw = df_raw.set_index("date").reindex(business_days).ffill().bfill().reset_index()
-    df_raw = df_raw.rename(columns={"index": "date"})
-    df_raw["missing_business_days_raw"] = len(business_days) - raw_unique
-    df_raw["missing_business_days_after_ffill"] = df_raw["cdi_daily"].isna().sum()
+    have = df_raw["date"].to_numpy("datetime64[ns]")
+    # Dias úteis com observação real do SGS (os demais vêm de ffill/bfill)
+    observed = np.isin(business_days.to_numpy(), have)
+    # business_days já está ordenado: reset_index único, sem sort posterior
+    df_raw = (
+        df_raw.set_index("date")
+        .reindex(business_days)
+        .ffill()
+        .bfill()
+        .rename_axis("date")
+        .reset_index()
+    )
+    df_raw["observed"] = observed
+    _set_gap_columns(df_raw)
+    df_raw["series_code"] = used_code
+    df_raw["fetched_on"] = pd.Timestamp.today().normalize()
 
-    return df_raw.sort_values("date").reset_index(drop=True), used_code
+    return df_raw, used_code
 
 
-def save_outputs(df: pd.DataFrame, processed_name: str = "cdi") -> Tuple[Path, Path]:
-    """Salva dataset processado e cópia bruta na área external."""
+def save_outputs(
+    df: pd.DataFrame,
+    processed_name: str = "cdi",
+    write_csv: bool = False,
+) -> Tuple[Path, Path]:
+    """Salva dataset processado e cópia bruta na área external.
+
+    Parquet (zstd) é sempre gravado; a cópia CSV só com write_csv=True.
+    """
     config = get_config()
     
     # Output directory
     output_dir = config.paths.data_processed / "cdi"
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    # Taxas |x| < 1 com poucos dígitos significativos: float32 basta
+    processed = df[["date", "cdi_annual", "cdi_daily"]].astype(
+        {"cdi_annual": "float32", "cdi_daily": "float32"}
+    )
     processed_path_parquet = output_dir / f"{processed_name}.parquet"
-    processed_path_csv = output_dir / f"{processed_name}.csv"
-    
-    df[["date", "cdi_annual", "cdi_daily"]].to_parquet(processed_path_parquet, index=False)
-    df[["date", "cdi_annual", "cdi_daily"]].to_csv(processed_path_csv, index=False)
+    processed.to_parquet(processed_path_parquet, engine="pyarrow", compression="zstd", index=False)
 
     raw_dir = config.paths.external_bcb
     raw_dir.mkdir(parents=True, exist_ok=True)
     raw_path_parquet = raw_dir / f"{processed_name}_raw.parquet"
-    raw_path_csv = raw_dir / f"{processed_name}_raw.csv"
-    df.to_parquet(raw_path_parquet, index=False)
-    df.to_csv(raw_path_csv, index=False)
+    df.to_parquet(raw_path_parquet, engine="pyarrow", compression="zstd", index=False)
+
+    if write_csv:
+        processed.to_csv(output_dir / f"{processed_name}.csv", index=False, float_format="%.10g")
+        df.to_csv(raw_dir / f"{processed_name}_raw.csv", index=False, float_format="%.10g")
 
     return processed_path_parquet, raw_path_parquet
 
 
-def run() -> None:
-    """Executa a coleta e persistência do CDI."""
+def run(refresh: bool = False) -> None:
+    """Executa a coleta e persistência do CDI (refresh=True ignora a cópia local)."""
     logging.basicConfig(level=logging.INFO)
-    df_cdi, used_code = fetch_cdi()
+    df_cdi, used_code = fetch_cdi(refresh=refresh)
     save_outputs(df_cdi)
     logger.info(
         "CDI carregado (série %s): %s linhas, %s a %s, gaps brutos: %s, gaps pós-ffill: %s",
@@ -138,4 +223,4 @@ def run() -> None:
 
 
 if __name__ == "__main__":
-    run()
+    run(refresh="--refresh" in sys.argv[1:])
@@ -17,15 +17,16 @@ Execute a partir da raiz do projeto:
 
 from __future__ import annotations
 
-import json
 import logging
 from pathlib import Path
-from typing import Dict, Iterable, Optional
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 from src.core.brapi_loader import BrapiLoader
 from src.core.config import get_config, Config
+from src.core.jsonio import write_json
 
 logger = logging.getLogger(__name__)
 
@@ -63,52 +64,18 @@ TARGET_COLUMNS = [
     "pre_tax_income",
 ]
 
-
-def _parse_date(value: object) -> Optional[pd.Timestamp]:
-    """Converte campo de data em Timestamp, tratando ints em epoch."""
-    if value is None:
-        return None
-    try:
-        if isinstance(value, (int, float)):
-            return pd.to_datetime(value, unit="s")
-        return pd.to_datetime(value)
-    except Exception:  # noqa: BLE001
-        return None
-
-
-def _ingest_module(
-    entries: Iterable[Dict],
-    mapping: Dict[str, str],
-    container: Dict[pd.Timestamp, Dict[str, float]],
-) -> None:
-    """Mescla métricas de um módulo em container por trimestre."""
-    for entry in entries or []:
-        date_field = (
-            entry.get("date")
-            or entry.get("endDate")
-            or entry.get("period")
-            or entry.get("mostRecentQuarter")
-            or entry.get("updatedAt")
-        )
-        dt = _parse_date(date_field)
-        if dt is None:
-            continue
-        dt = dt.tz_localize(None)
-        record = container.setdefault(dt, {})
-        for source_field, target_field in mapping.items():
-            value = entry.get(source_field)
-            if value is None:
-                continue
-            # Não sobrescreve valores já preenchidos
-            record.setdefault(target_field, value)
+# Componentes usados apenas no cálculo de métricas derivadas
+_DERIVED_INPUTS = ["debt_short", "debt_long", "operating_income", "depreciation"]
 
 
-def _normalize_brapi_payload(raw: Dict) -> pd.DataFrame:
-    """Extrai séries trimestrais do payload bruto da Brapi."""
-    quarter_data: Dict[pd.Timestamp, Dict[str, float]] = {}
+# Campos de data de cada entrada, em ordem de prioridade
+_DATE_FIELDS = ["date", "endDate", "period", "mostRecentQuarter", "updatedAt"]
 
-    _ingest_module(
-        raw.get("defaultKeyStatisticsHistoryQuarterly"),
+# Módulo Brapi -> {campo de origem: coluna de destino}. Módulos e campos
+# são ingeridos nesta ordem; o primeiro valor encontrado prevalece.
+MODULE_MAPPINGS: List[Tuple[str, Dict[str, str]]] = [
+    (
+        "defaultKeyStatisticsHistoryQuarterly",
         {
             "priceToEarnings": "pe_ratio",
             "trailingPE": "pe_ratio",
@@ -118,21 +85,17 @@ def _normalize_brapi_payload(raw: Dict) -> pd.DataFrame:
             "enterpriseToEbitda": "ev_ebitda",
             "dividendYield": "dividend_yield",
         },
-        quarter_data,
-    )
-
-    _ingest_module(
-        raw.get("financialDataHistoryQuarterly"),
+    ),
+    (
+        "financialDataHistoryQuarterly",
         {
             "totalRevenue": "revenue",
             "ebitda": "ebitda",
             "totalDebt": "total_debt",
         },
-        quarter_data,
-    )
-
-    _ingest_module(
-        raw.get("incomeStatementHistoryQuarterly"),
+    ),
+    (
+        "incomeStatementHistoryQuarterly",
         {
             "netIncome": "net_income",
             "totalRevenue": "revenue",
@@ -140,20 +103,16 @@ def _normalize_brapi_payload(raw: Dict) -> pd.DataFrame:
             "incomeTaxExpense": "tax_provision",
             "incomeBeforeTax": "pre_tax_income",
         },
-        quarter_data,
-    )
-
-    _ingest_module(
-        raw.get("cashflowHistoryQuarterly"),
+    ),
+    (
+        "cashflowHistoryQuarterly",
         {
             "netIncome": "net_income",
             "depreciation": "depreciation",
         },
-        quarter_data,
-    )
-
-    _ingest_module(
-        raw.get("balanceSheetHistoryQuarterly"),
+    ),
+    (
+        "balanceSheetHistoryQuarterly",
         {
             "totalStockholderEquity": "equity",
             "shareholdersEquity": "equity",
@@ -165,104 +124,124 @@ def _normalize_brapi_payload(raw: Dict) -> pd.DataFrame:
             "totalCurrentLiabilities": "current_liabilities",
             "inventory": "inventory",
         },
-        quarter_data,
-    )
+    ),
+]
+
+
+def _parse_dates(entries: pd.DataFrame) -> pd.Series:
+    """Data de cada entrada: primeiro campo de _DATE_FIELDS preenchido.
 
-    # Post-processing: Calculate derived fields if missing
-    for _date, record in quarter_data.items():
-        # Calculate Total Debt if missing
-        if record.get("total_debt") is None:
-            d_short = record.get("debt_short")
-            d_long = record.get("debt_long")
-            if d_short is not None or d_long is not None:
-                record["total_debt"] = (d_short or 0) + (d_long or 0)
-        
-        # Calculate EBITDA if missing (EBIT + Depreciation)
-        if record.get("ebitda") is None:
-            op_inc = record.get("operating_income")
-            dep = record.get("depreciation")
-            if op_inc is not None and dep is not None:
-                record["ebitda"] = op_inc + dep
-        
-        # --- Imputation for Missing Values (Forward Fill Logic) ---
-        # Note: This is a simple imputation for critical fields to ensure continuity.
-        # In a production pipeline, more sophisticated imputation (e.g., interpolation) might be used.
-        # Here we rely on the fact that balance sheet items (Equity, Debt, Assets) are stocks
-        # and tend to be stable, while flow items (Revenue, Income) are more volatile.
-        
-        # For now, we leave gaps as None to be handled by the analysis pipeline (e.g. ffill there).
-        # The focus here is on calculating derived metrics where components exist.
-
-        # --- Derived Metrics Calculations ---
-        
-        # ROE: Net Income / Equity
-        if record.get("roe") is None:
-            ni = record.get("net_income")
-            eq = record.get("equity")
-            if ni is not None and eq is not None and eq != 0:
-                record["roe"] = ni / eq
-
-        # ROA: Net Income / Total Assets
-        if record.get("roa") is None:
-            ni = record.get("net_income")
-            ta = record.get("total_assets")
-            if ni is not None and ta is not None and ta != 0:
-                record["roa"] = ni / ta
-
-        # Current Ratio: Current Assets / Current Liabilities
-        if record.get("current_ratio") is None:
-            ca = record.get("current_assets")
-            cl = record.get("current_liabilities")
-            if ca is not None and cl is not None and cl != 0:
-                record["current_ratio"] = ca / cl
-
-        # Quick Ratio: (Current Assets - Inventory) / Current Liabilities
-        if record.get("quick_ratio") is None:
-            ca = record.get("current_assets")
-            inv = record.get("inventory")
-            cl = record.get("current_liabilities")
-            if ca is not None and cl is not None and cl != 0:
-                inv_val = inv if inv is not None else 0
-                record["quick_ratio"] = (ca - inv_val) / cl
-
-        # Debt to Equity: Total Debt / Equity
-        if record.get("debt_to_equity") is None:
-            td = record.get("total_debt")
-            eq = record.get("equity")
-            if td is not None and eq is not None and eq != 0:
-                record["debt_to_equity"] = td / eq
-
-        # Net Margin: Net Income / Revenue
-        if record.get("net_margin") is None:
-            ni = record.get("net_income")
-            rev = record.get("revenue")
-            if ni is not None and rev is not None and rev != 0:
-                record["net_margin"] = ni / rev
-
-        # Asset Turnover: Revenue / Total Assets
-        if record.get("asset_turnover") is None:
-            rev = record.get("revenue")
-            ta = record.get("total_assets")
-            if rev is not None and ta is not None and ta != 0:
-                record["asset_turnover"] = rev / ta
-
-    if not quarter_data:
+    Números são tratados como epoch em segundos; textos como ISO 8601.
+    Datas inválidas viram NaT.
+    """
+    values = entries.reindex(columns=_DATE_FIELDS).to_numpy(dtype=object)
+    valid = pd.notna(values) & (values != 0) & (values != "")
+    first = values[np.arange(len(values)), valid.argmax(axis=1)]
+    raw = pd.Series(np.where(valid.any(axis=1), first, None), index=entries.index, dtype=object)
+
+    is_epoch = raw.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool))
+    epoch = pd.to_datetime(pd.to_numeric(raw.where(is_epoch), errors="coerce"), unit="s")
+    text = pd.to_datetime(
+        raw.where(~is_epoch), errors="coerce", utc=True, format="ISO8601"
+    ).dt.tz_localize(None)
+    return text.fillna(epoch)
+
+
+def _module_df(entries: Optional[List[Dict]], mapping: Dict[str, str]) -> pd.DataFrame:
+    """Métricas de um módulo indexadas por quarter_end (uma linha por trimestre)."""
+    frame = pd.DataFrame(list(entries or []))
+    if frame.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="quarter_end"))
+
+    out = pd.DataFrame(index=frame.index)
+    for source_field, target_field in mapping.items():
+        if source_field not in frame:
+            continue
+        # Não sobrescreve valores já preenchidos
+        if target_field in out:
+            out[target_field] = out[target_field].fillna(frame[source_field])
+        else:
+            out[target_field] = frame[source_field]
+
+    out["quarter_end"] = _parse_dates(frame)
+    out = out.dropna(subset=["quarter_end"])
+    # Entradas repetidas do mesmo trimestre: primeiro valor não nulo prevalece
+    return out.groupby("quarter_end", sort=False).first()
+
+
+def _normalize_brapi_payload(raw: Dict) -> pd.DataFrame:
+    """Extrai séries trimestrais do payload bruto da Brapi."""
+    acc: Optional[pd.DataFrame] = None
+    for module, mapping in MODULE_MAPPINGS:
+        module_df = _module_df(raw.get(module), mapping)
+        acc = module_df if acc is None else acc.combine_first(module_df)
+
+    if acc is None or len(acc.index) == 0:
         return pd.DataFrame(columns=TARGET_COLUMNS)
 
-    df = pd.DataFrame.from_dict(quarter_data, orient="index").reset_index()
-    df = df.rename(columns={"index": "quarter_end"})
-    df["quarter_end"] = pd.to_datetime(df["quarter_end"]).dt.tz_localize(None)
+    df = acc.reset_index()
+
+    df = _add_derived_metrics(df)
+
+    df = df.reindex(columns=TARGET_COLUMNS)
+    df = df.sort_values("quarter_end").reset_index(drop=True)
+    return df
+
 
-    for col in TARGET_COLUMNS:
-        if col not in df.columns:
-            df[col] = None
+def _add_derived_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """Calcula métricas derivadas ausentes, coluna a coluna (vetorizado).
+
+    Valores já reportados pela Brapi não são sobrescritos; razões só são
+    preenchidas quando numerador e denominador existem e o denominador
+    é diferente de zero.
+    """
+    metric_cols = [c for c in TARGET_COLUMNS + _DERIVED_INPUTS if c != "quarter_end"]
+    df = df.reindex(columns=list(df.columns) + [c for c in metric_cols if c not in df.columns])
+    df[metric_cols] = df[metric_cols].apply(pd.to_numeric, errors="coerce")
+
+    def fill(col: str, values: pd.Series) -> None:
+        df[col] = df[col].fillna(values)
+
+    def ratio(num: str, den: str) -> pd.Series:
+        return df[num] / df[den].where(df[den] != 0)
+
+    # Total Debt: curto + longo prazo quando ao menos um existe
+    debt_parts = df[["debt_short", "debt_long"]]
+    fill("total_debt", debt_parts.sum(axis=1).where(debt_parts.notna().any(axis=1)))
+
+    # EBITDA: EBIT + Depreciação
+    fill("ebitda", df["operating_income"] + df["depreciation"])
+
+    # Lacunas restantes ficam como NaN para o pipeline de análise (ex: ffill)
+
+    fill("roe", ratio("net_income", "equity"))
+    fill("roa", ratio("net_income", "total_assets"))
+    fill("current_ratio", ratio("current_assets", "current_liabilities"))
+    # Quick Ratio: estoque ausente conta como zero
+    fill(
+        "quick_ratio",
+        (df["current_assets"] - df["inventory"].fillna(0))
+        / df["current_liabilities"].where(df["current_liabilities"] != 0),
+    )
+    fill("debt_to_equity", ratio("total_debt", "equity"))
+    fill("net_margin", ratio("net_income", "revenue"))
+    fill("asset_turnover", ratio("revenue", "total_assets"))
 
-    df = df[TARGET_COLUMNS].sort_values("quarter_end").reset_index(drop=True)
     return df
 
 
-def save_outputs(df: pd.DataFrame, raw_payload: Dict, processed_name: str = "fundamentals_petr4") -> Path:
-    """Salva dataset processado e payload bruto."""
+def save_outputs(
+    df: pd.DataFrame,
+    raw_payload: Dict,
+    processed_name: str = "fundamentals_petr4",
+    write_csv: bool = False,
+) -> Path:
+    """Salva dataset processado e payload bruto.
+
+    Parquet (zstd) é sempre gravado; a cópia CSV só com write_csv=True.
+    O payload bruto é gravado como JSON, indentado fora de produção
+    (ENVIRONMENT != "production").
+    """
     config = get_config()
     
     # Output directory
@@ -270,15 +249,14 @@ def save_outputs(df: pd.DataFrame, raw_payload: Dict, processed_name: str = "fun
     output_dir.mkdir(parents=True, exist_ok=True)
     
     processed_path_parquet = output_dir / f"{processed_name}.parquet"
-    processed_path_csv = output_dir / f"{processed_name}.csv"
-    
-    df.to_parquet(processed_path_parquet, index=False)
-    df.to_csv(processed_path_csv, index=False)
+    df.to_parquet(processed_path_parquet, engine="pyarrow", compression="zstd", index=False)
+    if write_csv:
+        df.to_csv(output_dir / f"{processed_name}.csv", index=False, float_format="%.10g")
 
     raw_dir = config.paths.external_brapi
     raw_dir.mkdir(parents=True, exist_ok=True)
     raw_path = raw_dir / f"{processed_name}_brapi.json"
-    raw_path.write_text(json.dumps(raw_payload, ensure_ascii=False, indent=2))
+    write_json(raw_path, raw_payload, indent=config.env.environment != "production")
 
     return processed_path_parquet
 
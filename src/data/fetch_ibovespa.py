@@ -15,6 +15,7 @@ import logging
 from pathlib import Path
 from typing import Tuple
 
+import numpy as np
 import pandas as pd
 
 from src.core.brapi_loader import BrapiLoader
@@ -66,7 +67,10 @@ def _standardize_prices(df: pd.DataFrame, ticker: str) -> pd.DataFrame:
     ]
     available_cols = [c for c in cols if c in working.columns]
     working = working[available_cols]
-    working["ticker"] = ticker.replace(".SA", "").upper()
+    # Valor único repetido: categórico vira página de dicionário no parquet
+    working["ticker"] = pd.Categorical.from_codes(
+        np.zeros(len(working), dtype=np.int8), categories=[ticker.replace(".SA", "").upper()]
+    )
 
     return working.sort_values("date").reset_index(drop=True)
 
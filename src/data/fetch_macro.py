@@ -9,16 +9,124 @@ Coleta e processa variáveis exógenas:
 Gera dataset consolidado para modelagem M4.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import numpy as np
-import yfinance as yf
-import ipeadatapy as ipea
 from pathlib import Path
 from src.core.config import PROJECT_ROOT
+from src.core.parquet_io import read_parquet
+from src.core.http_session import (
+    PRICES_CACHE_TTL, fetch_with_fallback, get_cached_session, source_errors,
+)
+
+# Endpoint "spark" do Yahoo: fechamentos de até 20 símbolos por requisição
+YAHOO_SPARK_URL = "https://query1.finance.yahoo.com/v8/finance/spark"
+YAHOO_SPARK_BATCH = 20
+# Ranges diários aceitos pelo spark, do menor para o maior; acima de 10 anos
+# só há "max", que vem em granularidade mensal (spark não é usado)
+YAHOO_SPARK_RANGES = [("1y", 365), ("2y", 730), ("5y", 1826), ("10y", 3652)]
+
+
+def _spark_range(start_date):
+    """Menor range do spark que cobre desde start_date até hoje (None se > 10 anos)."""
+    days = (pd.Timestamp.today().normalize() - pd.to_datetime(start_date)).days
+    for name, span in YAHOO_SPARK_RANGES:
+        if days <= span:
+            return name
+    return None
+
+
+def parse_spark_payload(payload, tickers):
+    """
+    Converte a resposta do spark em DataFrame de fechamentos (uma coluna por ticker).
+
+    Aceita os dois formatos do endpoint: por símbolo no topo do JSON
+    ({"BZ=F": {"timestamp": ..., "close": ...}}) ou no formato de chart
+    ({"spark": {"result": [{"symbol": ..., "response": [...]}]}}).
+    Os timestamps (UTC) são convertidos para o fuso da bolsa
+    (meta.exchangeTimezoneName) antes de tomar a data do pregão; sem o
+    fuso na resposta, ou com granularidade diferente de diária, levanta
+    ValueError.
+    """
+    if "spark" in payload:
+        entries = {r["symbol"]: r["response"][0] for r in payload["spark"]["result"]}
+    else:
+        entries = payload
+    
+    series = {}
+    for ticker in tickers:
+        data = entries[ticker]
+        # Campos de meta podem vir no topo (formato por símbolo) ou em "meta"
+        meta = {**data, **data.get("meta", {})}
+        granularity = meta.get("dataGranularity", "1d")
+        if granularity != "1d":
+            raise ValueError(f"{ticker}: granularidade {granularity}")
+        tz = meta.get("exchangeTimezoneName")
+        if not tz:
+            raise ValueError(f"{ticker}: resposta sem exchangeTimezoneName")
+        if "indicators" in data:
+            close = data["indicators"]["quote"][0]["close"]
+        else:
+            close = data["close"]
+        
+        dates = (
+            pd.to_datetime(data["timestamp"], unit="s")
+            .tz_localize("UTC")
+            .tz_convert(tz)
+            .normalize()
+            .tz_localize(None)
+        )
+        close = pd.Series(np.asarray(close, dtype=float), index=dates, name=ticker)
+        series[ticker] = close[~close.index.duplicated(keep="last")]
+    
+    return pd.concat(series, axis=1)
+
+
+def fetch_yahoo_spark(tickers, start_date, end_date):
+    """
+    Coleta fechamentos diários via endpoint spark do Yahoo.
+
+    Uma requisição por lote de até 20 símbolos (em vez de uma por ticker).
+    Retorna DataFrame com uma coluna por ticker, indexado por data;
+    levanta exceção se o período passar de 10 anos ou se a resposta não
+    trouxer todos os tickers em base diária.
+    """
+    range_ = _spark_range(start_date)
+    if range_ is None:
+        raise ValueError(f"período desde {start_date} excede o range diário do spark")
+    
+    session = get_cached_session("yahoo_spark", PRICES_CACHE_TTL)
+    frames = []
+    for i in range(0, len(tickers), YAHOO_SPARK_BATCH):
+        batch = tickers[i:i + YAHOO_SPARK_BATCH]
+        response = session.get(
+            YAHOO_SPARK_URL,
+            params={"symbols": ",".join(batch), "range": range_, "interval": "1d"},
+            headers={"User-Agent": "Mozilla/5.0"},
+            timeout=30,
+        )
+        response.raise_for_status()
+        frames.append(parse_spark_payload(response.json(), batch))
+    
+    df = pd.concat(frames, axis=1)
+    # end exclusivo, como em yf.download
+    return df.loc[(df.index >= pd.to_datetime(start_date)) & (df.index < pd.to_datetime(end_date))]
+
 
 def fetch_yahoo_data(tickers, start_date, end_date):
-    """Coleta dados do Yahoo Finance."""
+    """Coleta dados do Yahoo Finance (spark em lote; fallback yf.download)."""
     print(f"Coletando {tickers} via Yahoo Finance...")
+    # Períodos acima de 10 anos não têm range diário no spark: direto ao yfinance
+    if _spark_range(start_date) is not None:
+        try:
+            return fetch_yahoo_spark(tickers, start_date, end_date)
+        except Exception as e:
+            # 401/429 ou formato inesperado: segue pelo caminho do yfinance
+            print(f"Spark indisponível ({e}); usando yf.download")
+    
+    import yfinance as yf
+
     # auto_adjust=False garante que Adj Close exista
     df = yf.download(tickers, start=start_date, end=end_date, progress=False, auto_adjust=False)
     
@@ -37,33 +145,41 @@ def fetch_yahoo_data(tickers, start_date, end_date):
         
     return df
 
+def _fetch_embi_ipea(start_date):
+    """Coleta EMBI+ via Ipeadata (levanta exceção em caso de falha)."""
+    import ipeadatapy as ipea
+
+    # JPM366_EMBI366 - EMBI+ Risco Brasil (Pontos base)
+    # Ipeadata retorna dataframe com índice data
+    embi = ipea.timeseries('JPM366_EMBI366')
+    
+    # Filtrar data
+    embi = embi[embi.index >= pd.to_datetime(start_date)]
+    
+    # Renomear coluna
+    # O nome da coluna pode variar, vamos pegar a última coluna que geralmente é o valor
+    # Ou usar o nome exato visto no teste: 'VALUE (-)'
+    col_name = 'VALUE (-)'
+    if col_name not in embi.columns:
+        # Tentar encontrar coluna de valor
+        cols = [c for c in embi.columns if 'VALUE' in c]
+        if cols:
+            col_name = cols[0]
+    
+    embi = embi[[col_name]].rename(columns={col_name: 'EMBI'})
+    
+    # Converter índice para datetime se não for
+    embi.index = pd.to_datetime(embi.index)
+    
+    return embi
+
 def fetch_embi(start_date):
-    """Coleta EMBI+ via Ipeadata."""
+    """Coleta EMBI+ via Ipeadata (última cópia válida se a fonte falhar)."""
     print("Coletando EMBI+ via Ipeadata...")
     try:
-        # JPM366_EMBI366 - EMBI+ Risco Brasil (Pontos base)
-        # Ipeadata retorna dataframe com índice data
-        embi = ipea.timeseries('JPM366_EMBI366')
-        
-        # Filtrar data
-        embi = embi[embi.index >= pd.to_datetime(start_date)]
-        
-        # Renomear coluna
-        # O nome da coluna pode variar, vamos pegar a última coluna que geralmente é o valor
-        # Ou usar o nome exato visto no teste: 'VALUE (-)'
-        col_name = 'VALUE (-)'
-        if col_name not in embi.columns:
-            # Tentar encontrar coluna de valor
-            cols = [c for c in embi.columns if 'VALUE' in c]
-            if cols:
-                col_name = cols[0]
-        
-        embi = embi[[col_name]].rename(columns={col_name: 'EMBI'})
-        
-        # Converter índice para datetime se não for
-        embi.index = pd.to_datetime(embi.index)
-        
-        return embi
+        return fetch_with_fallback(
+            "macro_embi", lambda: _fetch_embi_ipea(start_date), errors=source_errors()
+        )
     except Exception as e:
         print(f"Erro ao coletar EMBI: {e}")
         return pd.DataFrame()
@@ -76,7 +192,7 @@ def run_fetch_macro():
     
     # Carregar dados existentes para pegar range de datas
     print("Carregando dados de retornos existentes...")
-    df_returns = pd.read_parquet(returns_path).sort_values('date')
+    df_returns = read_parquet(returns_path).sort_values('date')
     start_date = df_returns['date'].min().strftime('%Y-%m-%d')
     end_date = df_returns['date'].max().strftime('%Y-%m-%d')
     
@@ -86,10 +202,18 @@ def run_fetch_macro():
     # BZ=F: Brent Crude Oil Last Day Finance
     # BRL=X: USD/BRL Exchange Rate
     yahoo_tickers = ['BZ=F', 'BRL=X']
-    df_yahoo = fetch_yahoo_data(yahoo_tickers, start_date, end_date)
     
     # 2. Coletar EMBI
-    df_embi = fetch_embi(start_date)
+    # Yahoo e Ipeadata são servidores independentes: coletas em paralelo
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future_yahoo = executor.submit(
+            fetch_with_fallback,
+            "macro_yahoo", lambda: fetch_yahoo_data(yahoo_tickers, start_date, end_date),
+            errors=source_errors(),
+        )
+        future_embi = executor.submit(fetch_embi, start_date)
+        df_yahoo = future_yahoo.result()
+        df_embi = future_embi.result()
     
     # 3. Unificar (Merge)
     # Usar índice de data
@@ -115,16 +239,26 @@ def run_fetch_macro():
     df_macro = df_macro.ffill()
     
     # 5. Engenharia de Features (Transformações)
+    # Uma passagem NumPy sobre [BZ=F, BRL=X, EMBI] (sem Series temporárias)
+    levels = df_macro[['BZ=F', 'BRL=X', 'EMBI']].to_numpy(dtype=np.float64)
+    feats = np.full(levels.shape, np.nan)
     
-    # Brent: Log Return
-    df_macro['ret_brent'] = np.log(df_macro['BZ=F'] / df_macro['BZ=F'].shift(1))
-    
-    # FX: Log Return
-    df_macro['ret_fx'] = np.log(df_macro['BRL=X'] / df_macro['BRL=X'].shift(1))
+    # Brent e FX: Log Return = log1p(Δp / p_{t-1}), mais preciso que
+    # log(p_t / p_{t-1}) para variações diárias pequenas; calculado no
+    # próprio buffer de saída
+    rets = feats[1:, :2]
+    prev = levels[:-1, :2]
+    np.subtract(levels[1:, :2], prev, out=rets)
+    np.divide(rets, prev, out=rets)
+    np.log1p(rets, out=rets)
     
     # EMBI: First Difference (Delta)
     # EMBI é em pontos base (ex: 200, 300). Delta mostra variação do risco.
-    df_macro['delta_embi'] = df_macro['EMBI'] - df_macro['EMBI'].shift(1)
+    np.subtract(levels[1:, 2], levels[:-1, 2], out=feats[1:, 2])
+    
+    df_macro['ret_brent'] = feats[:, 0]
+    df_macro['ret_fx'] = feats[:, 1]
+    df_macro['delta_embi'] = feats[:, 2]
     
     # Remover NaNs gerados pelos shifts
     df_macro = df_macro.dropna()
@@ -133,7 +267,9 @@ def run_fetch_macro():
     df_macro = df_macro.reset_index()
     
     # Salvar
-    df_macro.to_parquet(output_path)
+    df_macro.to_parquet(
+        output_path, engine='pyarrow', compression='zstd', compression_level=3, row_group_size=50_000
+    )
     print(f"Dados Macro salvos em {output_path}")
     print(df_macro[['date', 'ret_brent', 'ret_fx', 'delta_embi']].tail())
 
@@ -14,14 +14,20 @@ Execute a partir da raiz do projeto:
 from __future__ import annotations
 
 import logging
+import sys
 from pathlib import Path
 from typing import Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 
 from src.core.brapi_loader import BrapiLoader
 from src.core.config import get_config, Config
 from src.core.data_loader import YahooFinanceLoader
+from src.core.http_session import fetch_with_fallback, source_errors
 
 logger = logging.getLogger(__name__)
 
@@ -70,7 +76,10 @@ def _standardize_prices(df: pd.DataFrame, ticker: str) -> pd.DataFrame:
     ]
     available_cols = [c for c in cols if c in working.columns]
     working = working[available_cols]
-    working["ticker"] = ticker.replace(".SA", "").upper()
+    # Valor único repetido: categórico vira página de dicionário no parquet
+    working["ticker"] = pd.Categorical.from_codes(
+        np.zeros(len(working), dtype=np.int8), categories=[ticker.replace(".SA", "").upper()]
+    )
 
     return working.sort_values("date").reset_index(drop=True)
 
@@ -91,8 +100,35 @@ def _validate_coverage(df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp)
     }
 
 
+class PriceSourceError(RuntimeError):
+    """Nenhuma fonte de preços (Brapi/Yahoo) retornou dados."""
+
+
 def fetch_prices(range_: str = "10y", interval: str = "1d") -> Tuple[pd.DataFrame, str]:
-    """Tenta coletar preços via Brapi, caindo para Yahoo se necessário."""
+    """
+    Tenta coletar preços via Brapi, caindo para Yahoo se necessário.
+
+    Se nenhuma fonte responder (rede, HTTP, rate limit), devolve a última
+    cópia válida do mesmo ticker/range/interval via fetch_with_fallback;
+    erros de parsing ou de programação são propagados.
+    """
+    ticker = get_config().analysis.ticker_principal
+
+    def fetch() -> pd.DataFrame:
+        df, source = _fetch_prices_live(range_, interval)
+        # A fonte viaja com os dados para sobreviver à cópia em cache
+        return df.assign(source=source)
+
+    df = fetch_with_fallback(
+        f"prices_{ticker}_{range_}_{interval}",
+        fetch,
+        errors=source_errors() + (PriceSourceError,),
+    )
+    return df.drop(columns="source"), str(df["source"].iloc[0])
+
+
+def _fetch_prices_live(range_: str, interval: str) -> Tuple[pd.DataFrame, str]:
+    """Coleta preços via Brapi com fallback Yahoo Finance."""
     config: Config = get_config()
     ticker = config.analysis.ticker_principal
 
@@ -112,7 +148,7 @@ def fetch_prices(range_: str = "10y", interval: str = "1d") -> Tuple[pd.DataFram
 
     # Fallback: Yahoo Finance
     if not config.env.yahoo_finance_enabled:
-        raise RuntimeError("Brapi falhou e fallback Yahoo está desabilitado")
+        raise PriceSourceError("Brapi falhou e fallback Yahoo está desabilitado")
 
     yahoo_loader = YahooFinanceLoader(config)
     df_yahoo = yahoo_loader.fetch_prices(
@@ -122,37 +158,52 @@ def fetch_prices(range_: str = "10y", interval: str = "1d") -> Tuple[pd.DataFram
         interval=interval,
     )
     if df_yahoo.empty:
-        raise RuntimeError("Nenhuma fonte retornou dados de preços")
+        raise PriceSourceError("Nenhuma fonte retornou dados de preços")
 
     logger.info("Preços obtidos via Yahoo Finance")
     return df_yahoo, "yahoo_finance"
 
 
-def save_outputs(df: pd.DataFrame, source: str, processed_name: str = "prices_petr4") -> Path:
-    """Salva dataset processado e cópia bruta na área external."""
+def save_outputs(
+    df: pd.DataFrame,
+    source: str,
+    processed_name: str = "prices_petr4",
+    write_csv: bool = False,
+) -> Path:
+    """
+    Salva dataset processado e cópia bruta na área external.
+
+    Parquet (zstd, ticker como dicionário) é sempre gravado; as cópias
+    CSV só com write_csv=True.
+    """
     config = get_config()
+    df = df.astype({"ticker": "category"}) if "ticker" in df.columns else df
+    
+    # Conversão pandas → Arrow uma única vez; as duas cópias (processada e
+    # bruta) e os CSVs opcionais saem da mesma tabela
+    table = pa.Table.from_pandas(df, preserve_index=False)
     
     # Output directory
     output_dir = config.paths.data_processed / "prices"
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    processed_parquet = output_dir / f"{processed_name}.parquet"
-    processed_csv = output_dir / f"{processed_name}.csv"
-    
-    df.to_parquet(processed_parquet, index=False)
-    df.to_csv(processed_csv, index=False)
-
     raw_dir = config.paths.external_brapi if source == "brapi" else config.paths.external_yahoo
     raw_dir.mkdir(parents=True, exist_ok=True)
     raw_parquet = raw_dir / f"{processed_name}_{source}.parquet"
-    raw_csv = raw_dir / f"{processed_name}_{source}.csv"
-    df.to_parquet(raw_parquet, index=False)
-    df.to_csv(raw_csv, index=False)
+    
+    targets = [
+        (output_dir / f"{processed_name}.parquet", output_dir / f"{processed_name}.csv"),
+        (raw_parquet, raw_dir / f"{processed_name}_{source}.csv"),
+    ]
+    for parquet_path, csv_path in targets:
+        pq.write_table(table, parquet_path, compression="zstd", compression_level=3, row_group_size=50_000)
+        if write_csv:
+            pa_csv.write_csv(table, csv_path)
 
     return raw_parquet
 
 
-def run() -> None:
+def run(write_csv: bool = False) -> None:
     """Executa a coleta e persistência de preços."""
     logging.basicConfig(level=logging.INFO)
     config = get_config()
@@ -164,7 +215,7 @@ def run() -> None:
     standardized = standardized[(standardized["date"] >= start) & (standardized["date"] <= end)]
 
     coverage = _validate_coverage(standardized, start, end)
-    save_outputs(standardized, source)
+    save_outputs(standardized, source, write_csv=write_csv)
 
     logger.info(
         "Cobertura: %s linhas, %s a %s, %s dias úteis faltantes",
@@ -176,4 +227,4 @@ def run() -> None:
 
 
 if __name__ == "__main__":
-    run()
+    run(write_csv="--csv" in sys.argv[1:])
@@ -14,8 +14,11 @@ Saída:
 
 import pandas as pd
 import numpy as np
+import pyarrow.parquet as pq
 from pathlib import Path
 from src.core.config import PROJECT_ROOT
+from src.core.parquet_io import read_parquet
+from src.processing.calc_zscore import expanding_zscore
 
 def calculate_factors():
     # Caminhos
@@ -25,14 +28,23 @@ def calculate_factors():
     output_path = output_dir / "petr4_factors.parquet"
     
     print(f"Lendo fundamentos de {input_path}...")
-    df = pd.read_parquet(input_path)
+    # Apenas as colunas usadas nos proxies (roe/net_margin se existirem)
+    wanted = ['quarter_end', 'total_assets', 'roe', 'net_margin']
+    available = pq.read_schema(input_path).names
+    df = read_parquet(input_path, columns=[c for c in wanted if c in available])
     df = df.sort_values('quarter_end')
     
     # 1. CMA Proxy: Asset Growth
     # Variação percentual anual dos ativos totais
     # Como os dados são trimestrais, podemos fazer YoY ou QoQ. 
     # Fama-French usa variação anual. Vamos usar YoY para suavizar sazonalidade.
-    df['asset_growth_yoy'] = df['total_assets'].pct_change(periods=4)
+    # Divisão direta t / t-4 (mesmo resultado de pct_change(periods=4) sem
+    # preenchimento: trimestre ausente em t ou t-4 gera NaN)
+    ta = df['total_assets'].to_numpy(dtype=np.float64)
+    growth = np.full(ta.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth[4:] = ta[4:] / ta[:-4] - 1.0
+    df['asset_growth_yoy'] = growth
     
     # Se não tiver histórico suficiente para YoY no começo, preencher ou deixar NaN
     # Vamos usar fillna(0) para o começo ou bfill, mas ideal é deixar NaN e cortar na regressão
@@ -49,11 +61,11 @@ def calculate_factors():
     # Para evitar look-ahead bias, idealmente usar janela expansiva ou fixa.
     # Aqui vamos usar Z-Score expansivo (com mínimo de 4 trimestres)
     
-    def expanding_zscore(series):
-        return (series - series.expanding(min_periods=4).mean()) / series.expanding(min_periods=4).std()
-    
-    df['cma_proxy'] = expanding_zscore(df['asset_growth_yoy'])
-    df['rmw_proxy'] = expanding_zscore(df['profitability'])
+    z = expanding_zscore(
+        df[['asset_growth_yoy', 'profitability']].to_numpy(dtype=np.float64), min_periods=4
+    )
+    df['cma_proxy'] = z[:, 0]
+    df['rmw_proxy'] = z[:, 1]
     
     # Selecionar colunas finais
     cols = ['quarter_end', 'total_assets', 'asset_growth_yoy', 'profitability', 'cma_proxy', 'rmw_proxy']
@@ -66,7 +78,9 @@ def calculate_factors():
     print(f"Fatores calculados. Amostra: {len(df_factors)} trimestres.")
     print(df_factors[['quarter_end', 'cma_proxy', 'rmw_proxy']].tail())
     
-    df_factors.to_parquet(output_path)
+    df_factors.to_parquet(
+        output_path, engine='pyarrow', compression='zstd', compression_level=3, row_group_size=50_000
+    )
     print(f"Salvo em {output_path}")
 
 if __name__ == "__main__":
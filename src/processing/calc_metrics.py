@@ -13,12 +13,118 @@ Output:
     - data/processed/metrics.parquet
 """
 
+import math
+import sys
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 from src.core.config import PROJECT_ROOT, load_params
+from src.core.parquet_io import read_available_columns
 
-def calculate_metrics():
+# Fator de anualização da volatilidade diária (252 pregões/ano)
+SQRT252 = math.sqrt(252)
+
+# Colunas lidas de cada input (as ausentes no arquivo são ignoradas)
+FUND_COLUMNS = [
+    'quarter_end', 'tax_provision', 'pre_tax_income',
+    'pe_ratio', 'ebitda', 'revenue', 'total_debt', 'equity',
+    'ev_ebitda', 'pb_ratio', 'dividend_yield', 'roe', 'debt_to_equity', 'current_ratio'
+]
+RETURNS_COLUMNS = ['date', 'ret_petr4', 'ret_ibov', 'excess_ret_ibov']
+CDI_COLUMNS = ['date', 'cdi_annual']
+
+def _window_sums(a, window):
+    """Somas em janelas móveis de tamanho window (uma por janela completa)."""
+    cs = np.cumsum(a)
+    out = cs[window - 1:].copy()
+    out[1:] -= cs[:-window]
+    return out
+
+def rolling_beta_vol(rx, ry, window=252):
+    """
+    Beta (Cov(rx, ry) / Var(ry)) e volatilidade anualizada de rx em janelas móveis.
+
+    As somas móveis de x, y, x², y² e xy saem de somas acumuladas, em uma
+    única passagem pelos arrays, em vez de três rolling() (std, cov, var)
+    que percorrem as mesmas janelas. As séries são centradas na média
+    antes das somas (Var/Cov não mudam) para evitar cancelamento numérico.
+    Como no pandas (min_periods=window), janelas com NaN resultam em NaN.
+
+    Returns:
+        Tupla (beta, volatility) de arrays com o tamanho de rx.
+    """
+    n = rx.size
+    beta = np.full(n, np.nan)
+    vol = np.full(n, np.nan)
+    if n < window:
+        return beta, vol
+    
+    vx, vy = ~np.isnan(rx), ~np.isnan(ry)
+    x = np.where(vx, rx - np.nanmean(rx), 0.0) if vx.any() else np.zeros(n)
+    y = np.where(vy, ry - np.nanmean(ry), 0.0) if vy.any() else np.zeros(n)
+    
+    sx, sy = _window_sums(x, window), _window_sums(y, window)
+    sxx, syy, sxy = _window_sums(x * x, window), _window_sums(y * y, window), _window_sums(x * y, window)
+    
+    # Janelas completas (sem NaN) de cada estatística
+    full_x = _window_sums(vx, window) == window
+    full_y = _window_sums(vy, window) == window
+    full_xy = _window_sums(vx & vy, window) == window
+    
+    var_x = np.maximum(sxx - sx * sx / window, 0.0) / (window - 1)
+    var_y = np.maximum(syy - sy * sy / window, 0.0) / (window - 1)
+    cov = (sxy - sx * sy / window) / (window - 1)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(cov, var_y, out=cov)
+    beta[window - 1:] = np.where(full_xy & full_y, cov, np.nan)
+    
+    # Desvio padrão anualizado no próprio buffer de var_x
+    np.sqrt(var_x, out=var_x)
+    var_x *= SQRT252
+    vol[window - 1:] = np.where(full_x, var_x, np.nan)
+    return beta, vol
+
+def safe_divide(num, den):
+    """num / den elemento a elemento, com NaN onde den == 0 (em vez de ±inf)."""
+    den = np.asarray(den, dtype=np.float64)
+    num = np.broadcast_to(np.asarray(num, dtype=np.float64), den.shape)
+    return np.divide(num, den, out=np.full(den.shape, np.nan), where=den != 0)
+
+def asof_backward(index, values, targets):
+    """
+    Linhas de values na última data de index <= cada target (NaN se não houver).
+
+    Mesmo resultado de merge_asof(direction='backward') sobre o índice de
+    datas ordenado, via np.searchsorted + indexação, sem join de DataFrames.
+    Um índice fora de ordem é ordenado antes (argsort) junto com values.
+    """
+    dates = index.to_numpy(dtype='datetime64[ns]')
+    if not index.is_monotonic_increasing:
+        order = np.argsort(dates, kind='stable')
+        dates, values = dates[order], values[order]
+    pos = np.searchsorted(dates, targets, side='right') - 1
+    out = values[np.maximum(pos, 0)]
+    out[pos < 0] = np.nan
+    return out
+
+def _select_columns(df, wanted):
+    """Novo DataFrame com as colunas de wanted presentes em df (o original não é alterado)."""
+    return df.reindex(columns=[c for c in wanted if c in df.columns])
+
+def calculate_metrics(write_csv=False, df_fund=None, df_ret=None, df_cdi=None, save=True):
+    """
+    Calcula as métricas trimestrais (fundamentos, Beta, Volatilidade e EVS).
+
+    Inputs não informados são lidos de data/processed; DataFrames passados
+    (ex: por pipeline.run_all) são usados direto, sem serem alterados.
+    Parquet (zstd) é gravado se save=True; a cópia CSV só com write_csv=True.
+
+    Returns:
+        DataFrame de métricas por quarter_end.
+    """
     processed_dir = PROJECT_ROOT / "data" / "processed"
     fund_path = processed_dir / "fundamentals" / "fundamentals_petr4.parquet"
     
@@ -29,21 +135,21 @@ def calculate_metrics():
     
     # Output directory
     output_dir = processed_dir / "metrics"
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
     output_parquet = output_dir / "metrics.parquet"
     output_csv = output_dir / "metrics.csv"
 
-    if not all(p.exists() for p in [fund_path, returns_path, cdi_path]):
-        raise FileNotFoundError(f"Arquivos de entrada necessários não encontrados: {[p for p in [fund_path, returns_path, cdi_path] if not p.exists()]}")
+    inputs = {fund_path: df_fund, returns_path: df_ret, cdi_path: df_cdi}
+    missing = [p for p, df in inputs.items() if df is None and not p.exists()]
+    if missing:
+        raise FileNotFoundError(f"Arquivos de entrada necessários não encontrados: {missing}")
 
     # Load params (only for weights or other non-financial assumptions if needed)
     # params = load_params()
     
     print("Carregando dados...")
-    df_fund = pd.read_parquet(fund_path)
-    df_ret = pd.read_parquet(returns_path)
-    df_cdi = pd.read_parquet(cdi_path)
+    df_fund = read_available_columns(fund_path, FUND_COLUMNS) if df_fund is None else _select_columns(df_fund, FUND_COLUMNS)
+    df_ret = read_available_columns(returns_path, RETURNS_COLUMNS) if df_ret is None else _select_columns(df_ret, RETURNS_COLUMNS)
+    df_cdi = read_available_columns(cdi_path, CDI_COLUMNS) if df_cdi is None else _select_columns(df_cdi, CDI_COLUMNS)
     
     # =========================================================================
     # 0. Cálculo Dinâmico de Premissas (MRP e Tax Rate)
@@ -66,13 +172,15 @@ def calculate_metrics():
     # Média histórica de (Income Tax Expense / Income Before Tax)
     # Se colunas não existirem, usar estatutária 34%
     if 'tax_provision' in df_fund.columns and 'pre_tax_income' in df_fund.columns:
-        # Evitar divisão por zero
-        valid_tax = df_fund[df_fund['pre_tax_income'] != 0].copy()
-        if not valid_tax.empty:
-            valid_tax['effective_tax_rate'] = valid_tax['tax_provision'] / valid_tax['pre_tax_income']
+        # Evitar divisão por zero (sem copiar df_fund: divisão mascarada)
+        pre_tax = df_fund['pre_tax_income'].to_numpy(dtype=np.float64)
+        provision = df_fund['tax_provision'].to_numpy(dtype=np.float64)
+        valid = pre_tax != 0
+        if valid.any():
+            effective_tax_rate = np.divide(provision, pre_tax, out=np.full(pre_tax.shape, np.nan), where=valid)
             # Filtrar outliers (tax rate negativo ou > 100% pode acontecer em ajustes contábeis, mas para valuation queremos a normalizada)
             # Vamos pegar a mediana para ser robusto a outliers
-            tax_rate = valid_tax['effective_tax_rate'].median()
+            tax_rate = np.nanmedian(effective_tax_rate)
             
             # Tax provision geralmente é negativo no DRE? Depende da fonte.
             # Se tax_provision for negativo (despesa) e income positivo, rate é negativo.
@@ -107,16 +215,13 @@ def calculate_metrics():
     
     window = 252
     
-    # Volatilidade Anualizada
-    # Std Dev diário * sqrt(252)
-    rolling_std = df_ret['ret_petr4'].rolling(window=window).std()
-    df_ret['volatility'] = rolling_std * np.sqrt(252)
-
-    # Beta
-    # Cov(Ri, Rm) / Var(Rm)
-    rolling_cov = df_ret['ret_petr4'].rolling(window=window).cov(df_ret['ret_ibov'])
-    rolling_var = df_ret['ret_ibov'].rolling(window=window).var()
-    df_ret['beta'] = rolling_cov / rolling_var
+    # Volatilidade Anualizada: Std Dev diário * sqrt(252)
+    # Beta: Cov(Ri, Rm) / Var(Rm)
+    # Ambos em uma única passagem sobre [ret_petr4, ret_ibov]
+    rets = df_ret[['ret_petr4', 'ret_ibov']].to_numpy(dtype=np.float64)
+    beta, volatility = rolling_beta_vol(rets[:, 0], rets[:, 1], window)
+    df_ret['volatility'] = volatility
+    df_ret['beta'] = beta
 
     # Resample para trimestral (pegando o último valor do trimestre)
     # Precisamos alinhar com as datas de quarter_end do df_fund
@@ -127,54 +232,48 @@ def calculate_metrics():
     # =========================================================================
     print("Calculando métricas fundamentalistas...")
     
+    # Divisões mascaradas: denominador zero vira NaN direto, sem varrer o
+    # DataFrame inteiro atrás de inf depois
     # Earnings Yield = 1 / P/L
-    df_fund['earnings_yield'] = 1 / df_fund['pe_ratio']
+    df_fund['earnings_yield'] = safe_divide(1.0, df_fund['pe_ratio'])
     
     # EBITDA Margin = EBITDA / Revenue
-    df_fund['ebitda_margin'] = df_fund['ebitda'] / df_fund['revenue']
+    df_fund['ebitda_margin'] = safe_divide(df_fund['ebitda'], df_fund['revenue'])
     
     # ROIC (Aproximação)
     # NOPAT ~ EBITDA * (1 - t)
     # Invested Capital ~ Total Debt + Equity
     nopat = df_fund['ebitda'] * (1 - tax_rate)
     invested_capital = df_fund['total_debt'] + df_fund['equity']
-    df_fund['roic'] = nopat / invested_capital
-    
-    # Tratamento de divisão por zero ou nulos
-    df_fund.replace([np.inf, -np.inf], np.nan, inplace=True)
+    df_fund['roic'] = safe_divide(nopat, invested_capital)
 
     # =========================================================================
     # 3. Integração Mercado + Fundamentos
     # =========================================================================
     print("Integrando dados de mercado e fundamentos...")
     
-    # Ordenar por data
-    df_fund.sort_values('quarter_end', inplace=True)
-    df_ret.sort_index(inplace=True)
+    # Ordenar por data (só se necessário: os inputs normalmente já vêm ordenados)
+    if not df_fund['quarter_end'].is_monotonic_increasing:
+        df_fund.sort_values('quarter_end', inplace=True)
+    if not df_ret.index.is_monotonic_increasing:
+        df_ret.sort_index(inplace=True)
+    if not df_cdi.index.is_monotonic_increasing:
+        df_cdi.sort_index(inplace=True)
     
     # Para cada quarter_end, pegar o beta e vol do dia (ou dia útil anterior)
-    market_metrics = df_ret[['beta', 'volatility']].reset_index()
-    
-    df_merged = pd.merge_asof(
-        df_fund,
-        market_metrics,
-        left_on='quarter_end',
-        right_on='date',
-        direction='backward'
+    # (busca binária nas datas ordenadas, equivalente ao merge_asof backward)
+    df_merged = df_fund.reset_index(drop=True)
+    quarter_ends = df_merged['quarter_end'].to_numpy(dtype='datetime64[ns]')
+    df_merged[['beta', 'volatility']] = asof_backward(
+        df_ret.index, df_ret[['beta', 'volatility']].to_numpy(dtype=np.float64), quarter_ends
     )
     
     # Pegar CDI anual para o cálculo do WACC/Ke
     # O CDI está diário, precisamos do anualizado ou pegar da coluna cdi_annual se existir
     # No script anterior, cdi.parquet tem 'cdi_annual'
-    cdi_metrics = df_cdi[['cdi_annual']].reset_index()
-    df_merged = pd.merge_asof(
-        df_merged,
-        cdi_metrics,
-        left_on='quarter_end',
-        right_on='date',
-        direction='backward',
-        suffixes=('', '_cdi')
-    )
+    df_merged['cdi_annual'] = asof_backward(
+        df_cdi.index, df_cdi[['cdi_annual']].to_numpy(dtype=np.float64), quarter_ends
+    )[:, 0]
 
     # =========================================================================
     # 4. Cálculo do EVS (Economic Value Spread)
@@ -212,13 +311,25 @@ def calculate_metrics():
     
     # Verificar colunas disponíveis
     available_cols = [c for c in cols_final if c in df_merged.columns]
-    df_final = df_merged[available_cols].copy()
+    # A seleção por lista (take) já copia as colunas para um novo DataFrame,
+    # independente de df_merged; um .copy() extra duplicaria a saída inteira
+    df_final = df_merged[available_cols]
 
     # Salvar
-    print(f"Salvando {len(df_final)} registros em {output_dir}...")
-    df_final.to_parquet(output_parquet)
-    df_final.to_csv(output_csv, index=False)
+    if save:
+        print(f"Salvando {len(df_final)} registros em {output_dir}...")
+        output_dir.mkdir(parents=True, exist_ok=True)
+        # Ordenado por quarter_end; a ordenação fica registrada nos metadados
+        # do parquet (sorting_columns) para os leitores seguintes
+        table = pa.Table.from_pandas(df_final, preserve_index=False)
+        pq.write_table(
+            table, output_parquet, compression='zstd',
+            sorting_columns=[pq.SortingColumn(table.schema.get_field_index('quarter_end'))]
+        )
+        if write_csv:
+            df_final.to_csv(output_csv, index=False)
     print("Concluído.")
+    return df_final
 
 if __name__ == "__main__":
-    calculate_metrics()
+    calculate_metrics(write_csv="--csv" in sys.argv[1:])
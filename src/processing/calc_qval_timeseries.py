@@ -11,28 +11,42 @@ Output:
     - data/processed/qval_timeseries.parquet
 """
 
+import sys
 import pandas as pd
 import numpy as np
+import pyarrow.parquet as pq
 from pathlib import Path
 from src.core.config import PROJECT_ROOT
+from src.core.parquet_io import read_parquet
 
-def calculate_qval():
+# Níveis da recomendação, do pior para o melhor sinal; INSUFICIENTE por último
+RECOMMENDATION_LEVELS = ['VENDA', 'NEUTRO', 'COMPRA', 'INSUFICIENTE']
+
+def _nan_average(sums, counts):
+    """Divide somas por contagens de valores válidos; contagem zero vira NaN."""
+    return np.divide(sums, counts, out=np.full(np.shape(sums), np.nan), where=counts > 0)
+
+def calculate_qval(write_csv=False, df_zscores=None, save=True):
+    """
+    Calcula os scores dimensionais, o Q-VAL e a recomendação por trimestre.
+
+    Sem df_zscores, lê data/processed/zscores/zscores.parquet; o DataFrame
+    passado (ex: por pipeline.run_all) não é alterado. Parquet (zstd) é
+    gravado se save=True; a cópia CSV só com write_csv=True.
+
+    Returns:
+        DataFrame da série temporal Q-VAL.
+    """
     processed_dir = PROJECT_ROOT / "data" / "processed"
     input_path = processed_dir / "zscores" / "zscores.parquet"
     
     output_dir = processed_dir / "qval"
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
     output_parquet = output_dir / "qval_timeseries.parquet"
     output_csv = output_dir / "qval_timeseries.csv"
 
-    if not input_path.exists():
+    if df_zscores is None and not input_path.exists():
         raise FileNotFoundError(f"Arquivo {input_path} não encontrado.")
 
-    print("Carregando Z-Scores...")
-    df = pd.read_parquet(input_path)
-    df.set_index('quarter_end', inplace=True)
-
     # Definição dos componentes
     components = {
         'score_valor': ['z_earnings_yield', 'z_ev_ebitda', 'z_pb_ratio', 'z_dividend_yield'],
@@ -40,58 +54,81 @@ def calculate_qval():
         'score_risco': ['z_beta', 'z_volatility', 'z_debt_to_equity']
     }
 
+    # Apenas quarter_end e os Z-Scores das dimensões (projeção na leitura)
+    wanted = ['quarter_end'] + [c for cols in components.values() for c in cols]
+    if df_zscores is None:
+        print("Carregando Z-Scores...")
+        available = pq.read_schema(input_path).names
+        df = read_parquet(input_path, columns=[c for c in wanted if c in available])
+    else:
+        df = df_zscores[[c for c in wanted if c in df_zscores.columns]]
+    df = df.set_index('quarter_end')
+
     print("Calculando scores dimensionais...")
-    
-    # Calcular média simples para cada dimensão, ignorando NaNs
-    for dim_name, cols in components.items():
-        # Verificar colunas existentes
-        valid_cols = [c for c in cols if c in df.columns]
-        if len(valid_cols) < len(cols):
-            missing = set(cols) - set(valid_cols)
+
+    # Matriz indicadora (z-scores × dimensões): as médias das três dimensões
+    # saem de dois produtos matriciais (somas e contagens de valores válidos)
+    dims = list(components)
+    cols = []
+    for dim_name, dim_cols in components.items():
+        valid_cols = [c for c in dim_cols if c in df.columns]
+        if len(valid_cols) < len(dim_cols):
+            missing = set(dim_cols) - set(valid_cols)
             print(f"Aviso: Colunas faltantes para {dim_name}: {missing}")
-        
-        if valid_cols:
-            df[dim_name] = df[valid_cols].mean(axis=1)
-        else:
-            df[dim_name] = np.nan
+        cols.extend(c for c in valid_cols if c not in cols)
+
+    W = np.zeros((len(cols), len(dims)))
+    for j, dim_cols in enumerate(components.values()):
+        W[[cols.index(c) for c in dim_cols if c in cols], j] = 1.0
+
+    # Média simples por dimensão, ignorando NaNs; dimensão sem dados = NaN
+    Z = df[cols].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(Z)
+    scores = _nan_average(np.where(valid, Z, 0.0) @ W, valid.astype(np.float64) @ W)
+    df[dims] = scores
 
     print("Calculando Q-VAL Agregado...")
-    
-    # Q-VAL Bruto = Média das 3 dimensões
-    # Se alguma dimensão for NaN, o resultado será NaN (comportamento padrão do pandas + mean se skipna=False, mas aqui queremos ser estritos?)
-    # Vamos permitir skipna=False para exigir as 3 dimensões?
+
+    # Q-VAL Bruto = Média das 3 dimensões disponíveis (skipna, como mean(axis=1))
     # Como é uma série histórica longa, pode haver momentos sem dados.
-    # Vamos usar mean(axis=1) que por padrão faz skipna=True, mas vamos monitorar.
-    
-    dims = ['score_valor', 'score_qualidade', 'score_risco']
-    df['qval_raw'] = df[dims].mean(axis=1)
-    
+    scores_valid = ~np.isnan(scores)
+    qval_raw = _nan_average(
+        np.where(scores_valid, scores, 0.0).sum(axis=1), scores_valid.sum(axis=1)
+    )
+    df['qval_raw'] = qval_raw
+
     # Transformação para escala 0-100
-    # Q-VAL Scaled = 50 + 10 * Raw
-    df['qval_scaled'] = 50 + 10 * df['qval_raw']
+    # Q-VAL Scaled = 50 + 10 * Raw (um buffer só, operações in-place)
+    qval_scaled = np.multiply(qval_raw, 10.0)
+    qval_scaled += 50.0
+    df['qval_scaled'] = qval_scaled
     
     # Clip para garantir limites razoáveis (opcional, mas estético)
     # df['qval_scaled'] = df['qval_scaled'].clip(0, 100) 
     # A metodologia não menciona clip, mas Z-scores podem ser extremos. Vamos manter raw.
 
     print("Gerando recomendações...")
-    def get_recommendation(score):
-        if pd.isna(score):
-            return "INSUFICIENTE"
-        if score > 60:
-            return "COMPRA"
-        elif score < 40:
-            return "VENDA"
-        else:
-            return "NEUTRO"
-
-    df['recommendation'] = df['qval_scaled'].apply(get_recommendation)
+    # > 60 COMPRA, < 40 VENDA, demais NEUTRO; sem score, INSUFICIENTE
+    score = qval_scaled
+    recommendation = np.select(
+        [np.isnan(score), score > 60, score < 40],
+        ['INSUFICIENTE', 'COMPRA', 'VENDA'],
+        default='NEUTRO'
+    )
+    # Categórico ordenado (VENDA < NEUTRO < COMPRA): dicionário no parquet e
+    # comparações/ordenação diretas nas etapas seguintes
+    df['recommendation'] = pd.Categorical(
+        recommendation, categories=RECOMMENDATION_LEVELS, ordered=True
+    )
 
     # Salvar
-    print(f"Salvando em {output_dir}...")
     df.reset_index(inplace=True)
-    df.to_parquet(output_parquet)
-    df.to_csv(output_csv, index=False)
+    if save:
+        print(f"Salvando em {output_dir}...")
+        output_dir.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(output_parquet, engine='pyarrow', compression='zstd')
+        if write_csv:
+            df.to_csv(output_csv, index=False)
     
     # Preview
     latest = df.iloc[-1]
@@ -101,6 +138,7 @@ def calculate_qval():
     print(f"Recomendação: {latest['recommendation']}")
     print("-" * 30)
     print("Concluído.")
+    return df
 
 if __name__ == "__main__":
-    calculate_qval()
+    calculate_qval(write_csv="--csv" in sys.argv[1:])
@@ -13,14 +13,65 @@ Output:
     - data/processed/returns.parquet
 """
 
+import sys
+from functools import reduce
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from src.core.config import PROJECT_ROOT
+from src.core.parquet_io import read_parquet
 
-def calculate_returns():
+def log_returns(prices):
+    """
+    Retornos logarítmicos ln(P_t / P_{t-1}) de um array de preços.
+
+    Razão e log são calculados no próprio array de saída (sem Series
+    intermediárias); o primeiro elemento é NaN, como no shift(1).
+    """
+    ret = np.full(prices.shape, np.nan)
+    np.divide(prices[1:], prices[:-1], out=ret[1:])
+    np.log(ret[1:], out=ret[1:])
+    return ret
+
+def align_common_dates(*series):
+    """
+    DataFrame com as Series nas datas presentes em todas elas (join inner).
+
+    Os índices (datas únicas) são intersectados uma vez como int64 e cada
+    série é recolhida por busca binária, sem joins de DataFrames
+    intermediários; índices fora de ordem são ordenados antes (argsort).
+    O resultado sai em ordem de data, com índice chamado 'date'.
+    """
+    keys = [s.index.to_numpy(dtype='datetime64[ns]').view('i8') for s in series]
+    common = reduce(np.intersect1d, keys)
+    data = {}
+    for s, k in zip(series, keys):
+        if s.index.is_monotonic_increasing:
+            pos = np.searchsorted(k, common)
+        else:
+            order = np.argsort(k, kind='stable')
+            pos = order[np.searchsorted(k[order], common)]
+        data[s.name] = s.to_numpy()[pos]
+    return pd.DataFrame(data, index=pd.DatetimeIndex(common.view('datetime64[ns]'), name='date'))
+
+def _date_indexed(df):
+    """Cópia de df indexada por 'date' (datetime, ordenada), sem alterar o original."""
+    if 'date' in df.columns:
+        df = df.assign(date=pd.to_datetime(df['date'])).set_index('date')
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    return df
+
+def calculate_returns(write_csv=False, df_petr4=None, df_ibov=None, df_cdi=None, save=True):
     """
     Calcula retornos logarítmicos e em excesso.
+
+    Inputs não informados são lidos de data/processed; DataFrames passados
+    (ex: por pipeline.run_all) são usados direto, sem serem alterados.
+    Parquet (zstd) é gravado se save=True; a cópia CSV só com write_csv=True.
+
+    Returns:
+        DataFrame de retornos (coluna 'date' + retornos e CDI diário).
     """
     # Caminhos dos arquivos
     processed_dir = PROJECT_ROOT / "data" / "processed"
@@ -30,48 +81,48 @@ def calculate_returns():
     
     # Output directory
     output_dir = processed_dir / "returns"
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
     output_parquet = output_dir / "returns.parquet"
     output_csv = output_dir / "returns.csv"
 
-    # Verificar existência dos arquivos
-    if not all(p.exists() for p in [prices_path, ibov_path, cdi_path]):
-        raise FileNotFoundError("Arquivos de entrada não encontrados em data/processed/")
+    # 1. Carregar dados (apenas os que não vieram em memória)
+    inputs = {prices_path: df_petr4, ibov_path: df_ibov, cdi_path: df_cdi}
+    missing = [p for p, df in inputs.items() if df is None and not p.exists()]
+    if missing:
+        raise FileNotFoundError(f"Arquivos de entrada não encontrados em data/processed/: {missing}")
 
-    # 1. Carregar dados
     print("Carregando dados...")
-    df_petr4 = pd.read_parquet(prices_path)
-    df_ibov = pd.read_parquet(ibov_path)
-    df_cdi = pd.read_parquet(cdi_path)
+    # Apenas as colunas usadas (projeção feita na leitura do parquet)
+    if df_petr4 is None:
+        df_petr4 = read_parquet(prices_path, columns=['date', 'adjusted_close'])
+    if df_ibov is None:
+        df_ibov = read_parquet(ibov_path, columns=['date', 'adjusted_close'])
+    if df_cdi is None:
+        df_cdi = read_parquet(cdi_path, columns=['date', 'cdi_daily'])
 
     # Garantir que 'date' é datetime e setar como index
-    for df in [df_petr4, df_ibov, df_cdi]:
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'])
-            df.set_index('date', inplace=True)
+    df_petr4, df_ibov, df_cdi = (_date_indexed(df) for df in (df_petr4, df_ibov, df_cdi))
 
     # 2. Calcular Retornos Logarítmicos
     # R_t = ln(P_t / P_{t-1})
     print("Calculando retornos logarítmicos...")
     
     # PETR4
-    df_petr4['ret_petr4'] = np.log(df_petr4['adjusted_close'] / df_petr4['adjusted_close'].shift(1))
+    ret_petr4 = pd.Series(
+        log_returns(df_petr4['adjusted_close'].to_numpy(dtype=np.float64)),
+        index=df_petr4.index, name='ret_petr4'
+    )
     
     # Ibovespa
-    df_ibov['ret_ibov'] = np.log(df_ibov['adjusted_close'] / df_ibov['adjusted_close'].shift(1))
+    ret_ibov = pd.Series(
+        log_returns(df_ibov['adjusted_close'].to_numpy(dtype=np.float64)),
+        index=df_ibov.index, name='ret_ibov'
+    )
 
     # 3. Merge das séries
     print("Unificando séries...")
-    # Começamos com PETR4 como base
-    df_returns = df_petr4[['ret_petr4']].copy()
-    
-    # Join com Ibovespa
-    df_returns = df_returns.join(df_ibov[['ret_ibov']], how='inner')
-    
-    # Join com CDI
+    # PETR4, Ibovespa e CDI nas datas comuns às três séries
     # O CDI já deve estar em taxa diária decimal (ex: 0.0004 para 0.04%)
-    df_returns = df_returns.join(df_cdi[['cdi_daily']], how='inner')
+    df_returns = align_common_dates(ret_petr4, ret_ibov, df_cdi['cdi_daily'])
 
     # 4. Calcular Retornos em Excesso
     print("Calculando retornos em excesso...")
@@ -89,10 +140,14 @@ def calculate_returns():
     df_returns.reset_index(inplace=True)
 
     # 6. Salvar
-    print(f"Salvando em {output_dir}...")
-    df_returns.to_parquet(output_parquet)
-    df_returns.to_csv(output_csv, index=False)
+    if save:
+        print(f"Salvando em {output_dir}...")
+        output_dir.mkdir(parents=True, exist_ok=True)
+        df_returns.to_parquet(output_parquet, engine='pyarrow', compression='zstd')
+        if write_csv:
+            df_returns.to_csv(output_csv, index=False)
     print("Concluído.")
+    return df_returns
 
 if __name__ == "__main__":
-    calculate_returns()
+    calculate_returns(write_csv="--csv" in sys.argv[1:])
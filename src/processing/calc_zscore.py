@@ -11,29 +11,77 @@ Output:
     - data/processed/zscores.parquet
 """
 
+import sys
 import pandas as pd
 import numpy as np
+import pyarrow.parquet as pq
 from pathlib import Path
 from src.core.config import PROJECT_ROOT
+from src.core.parquet_io import read_parquet
 
-def calculate_zscores():
+def expanding_zscore(X, min_periods=2, prior=False):
+    """
+    Z-Score expansivo de cada coluna de X (matriz N×M) via somas acumuladas.
+
+    Com prior=False equivale a (x - expanding().mean()) / expanding().std()
+    coluna a coluna; com prior=True, média e desvio vêm só dos períodos
+    anteriores (expanding().mean().shift(1)), sem look-ahead. Média e
+    desvio (ddof=1) saem de n, S1 e S2 acumulados sobre as observações
+    válidas, em uma única passagem NumPy. Cada coluna é centrada na
+    primeira observação válida antes das somas para evitar cancelamento
+    numérico em S2 - S1²/n.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if X.shape[0] == 0:
+        return X.copy()
+    
+    valid = ~np.isnan(X)
+    ref = X[valid.argmax(axis=0), np.arange(X.shape[1])]
+    ref = np.where(valid.any(axis=0), ref, 0.0)
+    centered = np.where(valid, X - ref, 0.0)
+    
+    n = np.cumsum(valid, axis=0)
+    s1 = np.cumsum(centered, axis=0)
+    s2 = np.cumsum(centered * centered, axis=0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = s1 / n
+        std = np.sqrt(np.maximum(s2 - s1 * mean, 0.0) / (n - 1))
+        mean[n < min_periods] = np.nan
+        std[n < min_periods] = np.nan
+        
+        if prior:
+            # Estatísticas até t-1 (shift(1))
+            nan_row = np.full((1, X.shape[1]), np.nan)
+            mean = np.vstack([nan_row, mean[:-1]])
+            std = np.vstack([nan_row, std[:-1]])
+        
+        z = (centered - mean) / std
+    
+    z[~valid] = np.nan
+    return z
+
+def calculate_zscores(write_csv=False, df_metrics=None, save=True):
+    """
+    Calcula os Z-Scores históricos das métricas.
+
+    Sem df_metrics, lê data/processed/metrics/metrics.parquet; o DataFrame
+    passado (ex: por pipeline.run_all) não é alterado. Parquet (zstd) é
+    gravado se save=True; a cópia CSV só com write_csv=True.
+
+    Returns:
+        DataFrame com quarter_end e as colunas z_*.
+    """
     processed_dir = PROJECT_ROOT / "data" / "processed"
     input_path = processed_dir / "metrics" / "metrics.parquet"
     
     output_dir = processed_dir / "zscores"
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
     output_parquet = output_dir / "zscores.parquet"
     output_csv = output_dir / "zscores.csv"
 
-    if not input_path.exists():
+    if df_metrics is None and not input_path.exists():
         raise FileNotFoundError(f"Arquivo {input_path} não encontrado.")
 
-    print("Carregando métricas...")
-    df = pd.read_parquet(input_path)
-    df.sort_values('quarter_end', inplace=True)
-    df.set_index('quarter_end', inplace=True)
-
     # Definição das métricas e direção
     # True = Quanto maior melhor (Z-Score normal)
     # False = Quanto menor melhor (Inverter Z-Score)
@@ -52,54 +100,58 @@ def calculate_zscores():
         # 'current_ratio': True # Opcional, não listado explicitamente no schema final do roteiro mas útil
     }
 
-    zscore_df = pd.DataFrame(index=df.index)
+    # Apenas quarter_end e as métricas normalizadas (projeção na leitura)
+    wanted = ['quarter_end', *metrics_config]
+    if df_metrics is None:
+        print("Carregando métricas...")
+        available = pq.read_schema(input_path).names
+        df = read_parquet(input_path, columns=[c for c in wanted if c in available])
+    else:
+        df = df_metrics[[c for c in wanted if c in df_metrics.columns]]
+    # metrics.parquet já é gravado ordenado por quarter_end (calc_metrics);
+    # a ordenação só é refeita se o input não estiver em ordem
+    if not df['quarter_end'].is_monotonic_increasing:
+        df = df.sort_values('quarter_end')
+    df = df.set_index('quarter_end')
 
     print("Calculando Z-Scores (Janela Expansível)...")
     
-    for metric, higher_is_better in metrics_config.items():
+    metrics = []
+    for metric in metrics_config:
         if metric not in df.columns:
             print(f"Aviso: Métrica {metric} não encontrada no input. Pulando.")
             continue
-            
-        series = df[metric]
-        
-        # Janela expansível
-        # Min_periods=2 para ter desvio padrão
-        expanding_mean = series.expanding(min_periods=2).mean()
-        expanding_std = series.expanding(min_periods=2).std()
-        
-        # Z-Score
-        # Z = (X - Mean) / Std
-        # Shiftamos mean e std para usar apenas dados PASSADOS (evitar look-ahead bias estrito)
-        # Porém, a metodologia diz: "normalização histórica do próprio ativo".
-        # Se usarmos expanding().mean() padrão, inclui o dado atual na média.
-        # Para rigor estrito de trading, deveríamos usar shift(1).
-        # O roteiro diz: "mu e sigma calculados sobre todos os períodos ANTERIORES a t".
-        # Então: shift(1).
-        
-        hist_mean = expanding_mean.shift(1)
-        hist_std = expanding_std.shift(1)
-        
-        z_score = (series - hist_mean) / hist_std
-        
-        # Inversão se necessário
-        if not higher_is_better:
-            z_score = -z_score
-            
-        zscore_df[f'z_{metric}'] = z_score
+        metrics.append(metric)
+    
+    # Z = (X - Mean) / Std, com mean e std calculados sobre todos os períodos
+    # ANTERIORES a t (roteiro: "normalização histórica do próprio ativo",
+    # sem look-ahead); min_periods=2 para ter desvio padrão
+    z = expanding_zscore(df[metrics].to_numpy(dtype=np.float64), min_periods=2, prior=True)
+    
+    # Inversão se necessário (quanto menor melhor)
+    sign = np.array([1.0 if metrics_config[m] else -1.0 for m in metrics])
+    # Somas acumuladas em float64 (precisão); Z-Scores gravados em float32,
+    # suficiente para scores e metade do tamanho para as etapas seguintes
+    zscore_df = pd.DataFrame(
+        (z * sign).astype(np.float32), index=df.index, columns=[f'z_{m}' for m in metrics]
+    )
 
     # Limpeza
     # Os primeiros registros serão NaN devido ao shift e min_periods
     # Vamos manter os NaNs para indicar falta de histórico suficiente
     
     print(f"Gerados {len(zscore_df.columns)} Z-Scores.")
-    print(f"Salvando em {output_dir}...")
     
     # Reset index para salvar quarter_end como coluna
     zscore_df.reset_index(inplace=True)
-    zscore_df.to_parquet(output_parquet)
-    zscore_df.to_csv(output_csv, index=False)
+    if save:
+        print(f"Salvando em {output_dir}...")
+        output_dir.mkdir(parents=True, exist_ok=True)
+        zscore_df.to_parquet(output_parquet, engine='pyarrow', compression='zstd')
+        if write_csv:
+            zscore_df.to_csv(output_csv, index=False)
     print("Concluído.")
+    return zscore_df
 
 if __name__ == "__main__":
-    calculate_zscores()
+    calculate_zscores(write_csv="--csv" in sys.argv[1:])
@@ -0,0 +1,65 @@
+"""
+Pipeline de Processamento (Assets 2.1 → 2.4) em um único processo.
+
+Encadeia retornos → métricas → Z-Scores → Q-VAL passando os DataFrames
+em memória, sem reler do disco o parquet gravado pela etapa anterior.
+Os inputs externos são lidos uma única vez (o CDI é compartilhado entre
+retornos e métricas). Cada módulo continua executável isoladamente.
+
+Input:
+    - data/processed/prices/prices_petr4.parquet
+    - data/processed/ibovespa/ibovespa.parquet
+    - data/processed/cdi/cdi.parquet
+    - data/processed/fundamentals/fundamentals_petr4.parquet
+
+Output (com save=True):
+    - data/processed/returns/returns.parquet
+    - data/processed/metrics/metrics.parquet
+    - data/processed/zscores/zscores.parquet
+    - data/processed/qval/qval_timeseries.parquet
+"""
+
+import sys
+from src.core.config import PROJECT_ROOT
+from src.core.parquet_io import read_available_columns, read_parquet
+from src.processing.calc_metrics import FUND_COLUMNS, calculate_metrics
+from src.processing.calc_qval_timeseries import calculate_qval
+from src.processing.calc_returns import calculate_returns
+from src.processing.calc_zscore import calculate_zscores
+
+def run_all(write_csv=False, save=True):
+    """
+    Executa as quatro etapas em sequência, compartilhando os DataFrames.
+
+    Args:
+        write_csv: Grava também as cópias CSV de cada etapa.
+        save: Grava o parquet de cada etapa (cache/depuração e insumo
+            das figuras); com False, nada é escrito em disco.
+
+    Returns:
+        DataFrame da série temporal Q-VAL.
+    """
+    processed_dir = PROJECT_ROOT / "data" / "processed"
+    prices_path = processed_dir / "prices" / "prices_petr4.parquet"
+    ibov_path = processed_dir / "ibovespa" / "ibovespa.parquet"
+    cdi_path = processed_dir / "cdi" / "cdi.parquet"
+    fund_path = processed_dir / "fundamentals" / "fundamentals_petr4.parquet"
+
+    missing = [p for p in [prices_path, ibov_path, cdi_path, fund_path] if not p.exists()]
+    if missing:
+        raise FileNotFoundError(f"Arquivos de entrada não encontrados: {missing}")
+
+    print("Carregando inputs...")
+    df_petr4 = read_parquet(prices_path, columns=['date', 'adjusted_close'])
+    df_ibov = read_parquet(ibov_path, columns=['date', 'adjusted_close'])
+    df_cdi = read_parquet(cdi_path, columns=['date', 'cdi_daily', 'cdi_annual'])
+    df_fund = read_available_columns(fund_path, FUND_COLUMNS)
+
+    df_ret = calculate_returns(write_csv, df_petr4=df_petr4, df_ibov=df_ibov, df_cdi=df_cdi, save=save)
+    df_metrics = calculate_metrics(write_csv, df_fund=df_fund, df_ret=df_ret, df_cdi=df_cdi, save=save)
+    df_zscores = calculate_zscores(write_csv, df_metrics=df_metrics, save=save)
+    return calculate_qval(write_csv, df_zscores=df_zscores, save=save)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run_all(write_csv="--csv" in args, save="--no-save" not in args)
@@ -0,0 +1,84 @@
+"""Equivalência dos kernels NumPy de src.processing.calc_metrics com o pandas."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.processing.calc_metrics import asof_backward, rolling_beta_vol
+
+WINDOW = 20
+
+
+def _pandas_beta_vol(rx, ry, window):
+    x, y = pd.Series(rx), pd.Series(ry)
+    beta = x.rolling(window).cov(y) / y.rolling(window).var()
+    vol = x.rolling(window).std() * np.sqrt(252)
+    return beta.to_numpy(), vol.to_numpy()
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(42)
+    ry = rng.normal(0.0, 0.02, 120)
+    rx = 1.3 * ry + rng.normal(0.0, 0.01, 120)
+    return rx, ry
+
+
+def test_rolling_beta_vol_matches_pandas(returns):
+    rx, ry = returns
+    beta, vol = rolling_beta_vol(rx, ry, WINDOW)
+    ref_beta, ref_vol = _pandas_beta_vol(rx, ry, WINDOW)
+
+    np.testing.assert_allclose(beta, ref_beta, rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(vol, ref_vol, rtol=1e-9, equal_nan=True)
+
+
+def test_rolling_beta_vol_nan_gaps_and_leading_nans(returns):
+    rx, ry = (a.copy() for a in returns)
+    rx[:5] = np.nan      # NaNs iniciais (primeiro retorno, histórico curto)
+    rx[50] = np.nan      # lacuna só em x: afeta vol e beta
+    ry[80:83] = np.nan   # lacuna só em y: afeta apenas beta
+    beta, vol = rolling_beta_vol(rx, ry, WINDOW)
+    ref_beta, ref_vol = _pandas_beta_vol(rx, ry, WINDOW)
+
+    np.testing.assert_array_equal(np.isnan(beta), np.isnan(ref_beta))
+    np.testing.assert_array_equal(np.isnan(vol), np.isnan(ref_vol))
+    np.testing.assert_allclose(beta, ref_beta, rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(vol, ref_vol, rtol=1e-9, equal_nan=True)
+
+
+def test_rolling_beta_vol_shorter_than_window(returns):
+    rx, ry = (a[:WINDOW - 1] for a in returns)
+    beta, vol = rolling_beta_vol(rx, ry, WINDOW)
+
+    assert beta.shape == vol.shape == rx.shape
+    assert np.isnan(beta).all() and np.isnan(vol).all()
+
+
+def _pandas_asof(dates, values, targets):
+    # Mesma resolução nas duas chaves (pandas 3 usa datetime64[us] por padrão)
+    right = pd.DataFrame({"date": pd.DatetimeIndex(dates).as_unit("ns"), "v": values})
+    right = right.sort_values("date")
+    left = pd.DataFrame({"quarter_end": pd.DatetimeIndex(targets).as_unit("ns")})
+    merged = pd.merge_asof(
+        left, right, left_on="quarter_end", right_on="date", direction="backward"
+    )
+    return merged["v"].to_numpy()
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_asof_backward_matches_merge_asof(shuffle):
+    dates = pd.bdate_range("2020-01-01", periods=60)
+    values = np.arange(60, dtype=float)
+    values[10] = np.nan
+    if shuffle:
+        order = np.random.default_rng(0).permutation(60)
+        dates, values = dates[order], values[order]
+    # Alvo anterior a todas as datas, alvos em fins de semana e além do fim
+    targets = pd.to_datetime(
+        ["2019-12-31", "2020-01-04", "2020-01-15", "2020-02-29", "2020-06-30"]
+    ).to_numpy(dtype="datetime64[ns]")
+
+    out = asof_backward(pd.DatetimeIndex(dates), values[:, None], targets)[:, 0]
+
+    np.testing.assert_array_equal(out, _pandas_asof(dates, values, targets))
@@ -0,0 +1,55 @@
+"""Equivalência do alinhamento de datas de src.processing.calc_returns com join inner."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.processing.calc_returns import align_common_dates, log_returns
+
+
+def _series(dates, name, seed):
+    values = np.random.default_rng(seed).normal(0.0, 0.01, len(dates))
+    values[::7] = np.nan
+    return pd.Series(values, index=pd.DatetimeIndex(dates, name="date"), name=name)
+
+
+def _pandas_join(*series):
+    df = series[0].to_frame()
+    for s in series[1:]:
+        df = df.join(s.to_frame(), how="inner")
+    return df.sort_index()
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_align_common_dates_matches_inner_join(shuffle):
+    # Calendários distintos: pregões da B3, Ibovespa com lacunas, CDI em dias úteis
+    petr4 = _series(pd.bdate_range("2023-01-02", periods=80), "ret_petr4", 1)
+    ibov = _series(pd.bdate_range("2023-01-05", periods=90)[::2], "ret_ibov", 2)
+    cdi = _series(pd.bdate_range("2022-12-01", periods=100), "cdi_daily", 3)
+    if shuffle:
+        rng = np.random.default_rng(0)
+        petr4, cdi = (s.iloc[rng.permutation(len(s))] for s in (petr4, cdi))
+
+    out = align_common_dates(petr4, ibov, cdi)
+
+    ref = _pandas_join(petr4, ibov, cdi)
+    assert out.index.name == "date"
+    assert out.index.is_monotonic_increasing
+    pd.testing.assert_frame_equal(out, ref, check_freq=False, check_index_type=False)
+
+
+def test_align_common_dates_without_overlap():
+    a = _series(pd.bdate_range("2023-01-02", periods=5), "a", 1)
+    b = _series(pd.bdate_range("2024-01-02", periods=5), "b", 2)
+
+    out = align_common_dates(a, b)
+
+    assert out.empty
+    assert list(out.columns) == ["a", "b"]
+
+
+def test_log_returns_matches_shift():
+    prices = pd.Series([10.0, 10.5, np.nan, 10.2, 9.8])
+
+    expected = np.log(prices / prices.shift(1)).to_numpy()
+    np.testing.assert_allclose(log_returns(prices.to_numpy()), expected, equal_nan=True)
@@ -0,0 +1,60 @@
+"""Equivalência do Z-Score expansivo (calc_zscore e calc_factors) com o pandas."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.processing.calc_zscore import expanding_zscore
+
+
+def _pandas_zscore(df, min_periods, prior):
+    # prior=True: calc_zscore (períodos anteriores); False: calc_factors
+    shift = 1 if prior else 0
+    mean = df.expanding(min_periods=min_periods).mean().shift(shift)
+    std = df.expanding(min_periods=min_periods).std().shift(shift)
+    return ((df - mean) / std).to_numpy()
+
+
+def _metrics():
+    rng = np.random.default_rng(7)
+    # Escalas bem diferentes (múltiplos, margens, bilhões)
+    X = rng.normal([10.0, 0.2, 5e9], [2.0, 0.05, 1e8], size=(40, 3))
+    return X
+
+
+@pytest.mark.parametrize("prior, min_periods", [(True, 2), (False, 4)])
+def test_expanding_zscore_matches_pandas(prior, min_periods):
+    X = _metrics()
+    z = expanding_zscore(X, min_periods=min_periods, prior=prior)
+
+    ref = _pandas_zscore(pd.DataFrame(X), min_periods, prior)
+    np.testing.assert_allclose(z, ref, rtol=1e-8, equal_nan=True)
+
+
+@pytest.mark.parametrize("prior, min_periods", [(True, 2), (False, 4)])
+def test_expanding_zscore_nan_gaps_and_leading_nans(prior, min_periods):
+    X = _metrics()
+    X[:6, 0] = np.nan       # métrica que só começa depois
+    X[[12, 13, 30], 1] = np.nan
+    X[:, 2][X[:, 2] > 5.05e9] = np.nan
+    z = expanding_zscore(X, min_periods=min_periods, prior=prior)
+
+    ref = _pandas_zscore(pd.DataFrame(X), min_periods, prior)
+    np.testing.assert_array_equal(np.isnan(z), np.isnan(ref))
+    np.testing.assert_allclose(z, ref, rtol=1e-8, equal_nan=True)
+
+
+@pytest.mark.parametrize("prior", [True, False])
+def test_expanding_zscore_all_nan_and_short_columns(prior):
+    X = _metrics()[:3]
+    X[:, 1] = np.nan
+    z = expanding_zscore(X, min_periods=4, prior=prior)
+
+    # Menos observações que min_periods: tudo NaN, inclusive a coluna vazia
+    assert z.shape == X.shape
+    assert np.isnan(z).all()
+
+
+def test_expanding_zscore_empty():
+    z = expanding_zscore(np.empty((0, 2)), min_periods=4)
+    assert z.shape == (0, 2)
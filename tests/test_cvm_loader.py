@@ -0,0 +1,42 @@
+"""Testes do download paralelo de DFPs (src.core.cvm_loader)."""
+
+import requests
+
+from src.core.cvm_loader import CVMLoader
+
+
+def _loader(tmp_path, failures):
+    """CVMLoader sem rede: _stream_to_file grava um ZIP fictício ou falha."""
+    loader = CVMLoader.__new__(CVMLoader)
+    loader.cache_dir = tmp_path
+
+    def _stream_to_file(url, cache_path):
+        year = int(cache_path.stem.rsplit("_", 1)[-1])
+        if year in failures:
+            raise failures[year]
+        cache_path.write_bytes(b"PK")
+        return 2
+
+    loader._stream_to_file = _stream_to_file
+    return loader
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} Server Error", response=response)
+
+
+def test_download_dfps_skips_failing_years(tmp_path):
+    failures = {
+        2021: _http_error(500),
+        2022: requests.exceptions.ConnectionError("conexão recusada"),
+        2023: _http_error(404),
+    }
+    loader = _loader(tmp_path, failures)
+
+    paths = loader.download_dfps([2020, 2021, 2022, 2023, 2024])
+
+    assert list(paths) == [2020, 2024]
+    assert paths[2020] == tmp_path / "dfp_cia_aberta_2020.zip"
+    assert paths[2024].exists()
@@ -0,0 +1,24 @@
+"""Equivalência de ols_hc3 (legacy.src.models.estimate_capm) com statsmodels HC3."""
+
+import numpy as np
+import pytest
+import statsmodels.api as sm
+
+from legacy.src.models.estimate_capm import ols_hc3
+
+
+@pytest.mark.parametrize("n", [5, 250])
+def test_ols_hc3_matches_statsmodels(n):
+    rng = np.random.default_rng(n)
+    x = rng.normal(0.0, 0.015, n)
+    # Heterocedástico: variância do erro cresce com |x|
+    y = 0.0002 + 1.2 * x + rng.normal(0.0, 0.01, n) * (1 + 20 * np.abs(x))
+
+    res = ols_hc3(x, y)
+    ref = sm.OLS(y, sm.add_constant(x)).fit(cov_type="HC3")
+
+    for name in ("params", "bse", "tvalues", "pvalues", "resid"):
+        np.testing.assert_allclose(res[name], np.asarray(getattr(ref, name)), rtol=1e-8, atol=1e-14)
+    assert res["rsquared"] == pytest.approx(ref.rsquared, rel=1e-10)
+    assert res["rsquared_adj"] == pytest.approx(ref.rsquared_adj, rel=1e-10)
+    assert res["nobs"] == ref.nobs
@@ -0,0 +1,112 @@
+"""Testes do parser da resposta spark do Yahoo (src.data.fetch_macro)."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.fetch_macro import _spark_range, parse_spark_payload
+
+# 2024-01-02 e 2024-01-03, 14:30 UTC (abertura da NYSE, 09:30 em Nova York)
+NY_OPEN = [1704205800, 1704292200]
+# 2024-01-02 e 2024-01-03, 00:00 UTC (barras diárias de câmbio em Londres)
+LONDON_MIDNIGHT = [1704153600, 1704240000]
+# 2024-01-02 e 2024-01-03, 00:00 em Tóquio = 15:00 UTC do dia anterior
+TOKYO_MIDNIGHT = [1704121200, 1704207600]
+
+
+@pytest.fixture
+def flat_payload():
+    """Resposta do spark no formato por símbolo."""
+    return {
+        "SPY": {
+            "symbol": "SPY",
+            "timestamp": NY_OPEN,
+            "close": [472.65, None],
+            "dataGranularity": "1d",
+            "meta": {"exchangeTimezoneName": "America/New_York"},
+        },
+        "BRL=X": {
+            "symbol": "BRL=X",
+            "timestamp": LONDON_MIDNIGHT,
+            "close": [4.85, 4.91],
+            "dataGranularity": "1d",
+            "exchangeTimezoneName": "Europe/London",
+        },
+    }
+
+
+@pytest.fixture
+def chart_payload():
+    """Resposta do spark no formato de chart."""
+    return {
+        "spark": {
+            "result": [
+                {
+                    "symbol": "SPY",
+                    "response": [
+                        {
+                            "meta": {
+                                "exchangeTimezoneName": "America/New_York",
+                                "dataGranularity": "1d",
+                            },
+                            "timestamp": NY_OPEN,
+                            "indicators": {"quote": [{"close": [472.65, 468.79]}]},
+                        }
+                    ],
+                }
+            ]
+        }
+    }
+
+
+def test_flat_payload_dates_in_exchange_timezone(flat_payload):
+    df = parse_spark_payload(flat_payload, ["SPY", "BRL=X"])
+
+    expected = pd.DatetimeIndex(["2024-01-02", "2024-01-03"])
+    assert df.index.equals(expected)
+    assert list(df.columns) == ["SPY", "BRL=X"]
+    assert df.loc["2024-01-02", "BRL=X"] == pytest.approx(4.85)
+    assert np.isnan(df.loc["2024-01-03", "SPY"])
+
+
+def test_dates_use_exchange_local_day():
+    payload = {
+        "^N225": {
+            "symbol": "^N225",
+            "timestamp": TOKYO_MIDNIGHT,
+            "close": [33288.29, 33464.17],
+            "dataGranularity": "1d",
+            "meta": {"exchangeTimezoneName": "Asia/Tokyo"},
+        }
+    }
+    df = parse_spark_payload(payload, ["^N225"])
+
+    # Em UTC as barras cairiam em 2024-01-01 e 2024-01-02
+    assert df.index.equals(pd.DatetimeIndex(["2024-01-02", "2024-01-03"]))
+    assert df["^N225"].tolist() == pytest.approx([33288.29, 33464.17])
+
+
+def test_chart_payload(chart_payload):
+    df = parse_spark_payload(chart_payload, ["SPY"])
+
+    assert df.index.equals(pd.DatetimeIndex(["2024-01-02", "2024-01-03"]))
+    assert df["SPY"].tolist() == pytest.approx([472.65, 468.79])
+
+
+def test_missing_timezone_raises(flat_payload):
+    del flat_payload["SPY"]["meta"]
+    with pytest.raises(ValueError, match="exchangeTimezoneName"):
+        parse_spark_payload(flat_payload, ["SPY"])
+
+
+def test_non_daily_granularity_raises(flat_payload):
+    flat_payload["SPY"]["dataGranularity"] = "1mo"
+    with pytest.raises(ValueError, match="granularidade"):
+        parse_spark_payload(flat_payload, ["SPY"])
+
+
+def test_spark_range_skips_spans_over_ten_years():
+    today = pd.Timestamp.today().normalize()
+    assert _spark_range(today - pd.Timedelta(days=300)) == "1y"
+    assert _spark_range(today - pd.Timedelta(days=3000)) == "10y"
+    assert _spark_range(today - pd.Timedelta(days=3653)) is None